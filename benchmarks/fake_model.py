@@ -0,0 +1,109 @@
+import hashlib
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Canned answers over the seeded music schema; a question always maps to
+# the same statement.
+CANNED_SQL = [
+    "SELECT al.album_id, al.title FROM album al WHERE al.label_id = {n};",
+    "SELECT COUNT(tr.*) AS track_count FROM track tr WHERE tr.album_id = {n};",
+    "SELECT rl.label_name, COUNT(al.*) AS albums FROM record_label rl "
+    "INNER JOIN album al ON al.label_id = rl.label_id GROUP BY rl.label_name;",
+    "SELECT tr.title, tr.duration FROM track tr INNER JOIN album al ON al.album_id = tr.album_id "
+    "WHERE al.release_year = {year} LIMIT 50;",
+]
+
+
+class FakeModelManager:
+    """
+    Stand-in for LlamaModelManager with the same pool interface.
+    Completions are chosen by hashing the question and "decoded" at a fixed
+    rate, so router benchmarks measure the stack, not the model.
+    Install it before the router is imported:
+
+        LlamaModelManager._instance = FakeModelManager()
+    """
+
+    def __init__(self, pool_size: int = 1, tokens_per_second: float = 0.0, prompt_seconds: float = 0.0):
+        self.pool_size = pool_size
+        self.tokens_per_second = tokens_per_second
+        self.prompt_seconds = prompt_seconds
+        self._idle: queue.Queue[int] = queue.Queue()
+        for slot in range(pool_size):
+            self._idle.put(slot)
+        self._lock = threading.Lock()
+        self.completions = 0
+
+    def warm_up(self) -> None:
+        pass
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[int]:
+        slot = self._idle.get(timeout=timeout)
+        try:
+            yield slot
+        finally:
+            self._idle.put(slot)
+
+    def sql_for(self, question: str) -> str:
+        digest = int(hashlib.sha256(question.encode()).hexdigest(), 16)
+        template = CANNED_SQL[digest % len(CANNED_SQL)]
+        return template.format(n=1 + digest % 20, year=1960 + digest % 65)
+
+    def answer(self, messages: list[dict], stop: Optional[list[str]] = None) -> str:
+        question = messages[-1]["content"].rsplit("Question:", 1)[-1].strip()
+        sql = self.sql_for(question)
+        for token in stop or ():
+            sql = sql.split(token, 1)[0]
+        return sql
+
+    def create_chat_completion(self, messages: list[dict], max_tokens: int = 1024,
+                               stop: Optional[list[str]] = None, **kwargs) -> dict:
+        sql = self.answer(messages, stop)
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        completion_tokens = min(max_tokens, max(1, len(sql) // 4))
+
+        with self.checkout():
+            delay = self.prompt_seconds
+            if self.tokens_per_second > 0:
+                delay += completion_tokens / self.tokens_per_second
+            if delay > 0:
+                time.sleep(delay)
+        with self._lock:
+            self.completions += 1
+
+        return {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": sql}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def stream_chat_completion(self, messages: list[dict], stop: Optional[list[str]] = None, **kwargs) -> Iterator[dict]:
+        text = self.answer(messages, stop)
+        with self.checkout():
+            if self.prompt_seconds > 0:
+                time.sleep(self.prompt_seconds)
+            # Roughly four characters per token, as create_chat_completion assumes.
+            for start in range(0, len(text), 4):
+                if self.tokens_per_second > 0:
+                    time.sleep(1 / self.tokens_per_second)
+                yield {"choices": [{"index": 0, "delta": {"content": text[start:start + 4]}, "finish_reason": None}]}
+        with self._lock:
+            self.completions += 1
+
+    def prime(self, **kwargs) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "loaded": self.pool_size,
+            "idle": self._idle.qsize(),
+            "completions": self.completions,
+        }
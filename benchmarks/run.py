@@ -0,0 +1,299 @@
+"""
+End-to-end benchmark of the MCP server and the /query router.
+
+Seeds the synthetic music schema, drives the `execute_query` tool, the
+`schema://analysis` resource (get_schema) and the router's POST /query at
+a fixed concurrency, and prints one JSON report with p50/p95/p99 latency,
+throughput and memory per component:
+
+    python -m benchmarks.run --dsn postgresql://user@localhost/bench --seed --scale 5 \\
+        --start-server --fake-model --requests 500 --concurrency 16 > bench.json
+
+The MCP server is reached at config.ini's [mcp_client] url. With
+--start-server the benchmark launches server.py itself against the
+benchmark database, using a copy of config.ini, and reports its peak RSS.
+--embedded uses a throwaway Postgres from the optional `pgserver`
+package instead of --dsn. The router runs in this process; --fake-model
+swaps in a deterministic model so results do not depend on llama.cpp.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from typing import Awaitable, Callable, Optional
+from src.config import load_section
+
+# Queries over the seeded schema; {n} varies per request so parameterized
+# shapes are exercised rather than a single cached statement.
+QUERIES = [
+    "SELECT al.album_id, al.title FROM album al WHERE al.label_id = {n}",
+    "SELECT COUNT(*) FROM track tr WHERE tr.album_id = {n}",
+    "SELECT rl.label_name, COUNT(*) FROM record_label rl "
+    "INNER JOIN album al ON al.label_id = rl.label_id GROUP BY rl.label_name",
+    "SELECT tr.title, tr.duration FROM track tr WHERE tr.artist_id = {n} LIMIT 100",
+]
+
+QUESTIONS = [
+    "Which albums were released on label {n}?",
+    "How many tracks are on album {n}?",
+    "How many albums does each record label have?",
+    "List the tracks of albums released in {year}",
+]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile.
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def memory_stats(pid: int | str = "self") -> dict:
+    """
+    Current and peak resident set size from /proc (Linux only).
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return {"rss_bytes": values.get("VmRSS"), "peak_rss_bytes": values.get("VmHWM")}
+
+
+async def measure(call: Callable[[int], Awaitable[None]], requests: int, concurrency: int) -> dict:
+    """
+    Runs `call(i)` for i in range(requests) with `concurrency` in flight.
+    """
+    latencies: list[float] = []
+    errors: list[str] = []
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": 1000 * percentile(latencies, 50),
+            "p95": 1000 * percentile(latencies, 95),
+            "p99": 1000 * percentile(latencies, 99),
+            "max": 1000 * latencies[-1] if latencies else 0.0,
+        },
+    }
+
+
+def tool_error(result) -> Optional[str]:
+    text = getattr(result.content[0], "text", "") if result.content else ""
+    if getattr(result, "is_error", False) or text.startswith(("Error:", "Only SELECT")):
+        return text or "tool error"
+    return None
+
+
+async def bench_mcp(url: str, requests: int, concurrency: int) -> dict:
+    from fastmcp import Client
+
+    clients = [Client(url) for _ in range(concurrency)]
+    for client in clients:
+        await client.__aenter__()
+    # One session per concurrent request, as the router's McpClientPool does.
+    idle: asyncio.Queue = asyncio.Queue()
+    for client in clients:
+        idle.put_nowait(client)
+
+    async def with_client(fn):
+        client = await idle.get()
+        try:
+            return await fn(client)
+        finally:
+            idle.put_nowait(client)
+
+    async def execute_query(i: int):
+        sql = QUERIES[i % len(QUERIES)].format(n=1 + i % 20)
+        result = await with_client(lambda c: c.call_tool("execute_query", {"sql": sql}, raise_on_error=False))
+        error = tool_error(result)
+        if error:
+            raise RuntimeError(error)
+
+    async def get_schema(i: int):
+        await with_client(lambda c: c.read_resource("schema://analysis"))
+
+    try:
+        return {
+            "execute_query": await measure(execute_query, requests, concurrency),
+            "get_schema": await measure(get_schema, requests, concurrency),
+        }
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+
+
+async def bench_router(requests: int, concurrency: int, fake_model: bool, tokens_per_second: float) -> dict:
+    import httpx
+    from src.llama_model_manager import LlamaModelManager
+
+    if fake_model:
+        from benchmarks.fake_model import FakeModelManager
+        LlamaModelManager._instance = FakeModelManager(
+            pool_size=int(load_section("model").get("pool_size", 1)), tokens_per_second=tokens_per_second
+        )
+
+    # Imported late: the router builds its pools from the model manager at import.
+    from routers import sql_query_router
+    # Keep benchmark questions out of the persisted generation cache.
+    sql_query_router.generation_cache.path = None
+
+    async def query(i: int):
+        question = QUESTIONS[i % len(QUESTIONS)].format(n=1 + i % 20, year=1960 + i % 65)
+        response = await client.post("/query", json={"question": question})
+        response.raise_for_status()
+
+    async with sql_query_router.app.router.lifespan_context(sql_query_router.app):
+        # The app warms up in the background; measure from ready, like an orchestrator would route.
+        while not sql_query_router.startup.ready:
+            await asyncio.sleep(0.05)
+        transport = httpx.ASGITransport(app=sql_query_router.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            report = {"startup": sql_query_router.startup.stats(), "query": await measure(query, requests, concurrency)}
+            report["query"]["generation_cache"] = sql_query_router.generation_cache.stats()
+    return report
+
+
+def start_server(url: str, dsn: Optional[str], schema: str, timeout: float = 60.0) -> subprocess.Popen:
+    """
+    Runs server.py from a scratch directory whose config.ini is this one
+    pointed at the benchmark database.
+    """
+    import httpx
+
+    config = ConfigParser()
+    config.read("config.ini")
+    if dsn:
+        config["database"]["url"] = "postgresql+asyncpg://" + dsn.split("://", 1)[1]
+    config["database"]["schema"] = schema
+    workdir = tempfile.mkdtemp(prefix="bench-server-")
+    with open(os.path.join(workdir, "config.ini"), "w") as f:
+        config.write(f)
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath("server.py")], cwd=workdir,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    metrics_url = url.rsplit("/", 1)[0] + "/metrics"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with {process.returncode}")
+        try:
+            if httpx.get(metrics_url, timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"server.py did not come up within {timeout}s")
+
+
+async def run(args) -> dict:
+    report: dict = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "dsn"},
+    }
+
+    dsn = args.dsn
+    embedded = None
+    if args.embedded:
+        try:
+            import pgserver
+        except ImportError:
+            raise SystemExit("--embedded needs the optional `pgserver` package installed.")
+        embedded = pgserver.get_server(tempfile.mkdtemp(prefix="bench-pg-"), cleanup_mode="delete")
+        dsn = embedded.get_uri()
+
+    if args.seed:
+        from benchmarks.seed_music import seed
+        started = time.perf_counter()
+        report["dataset"] = {"tables": await seed(dsn, args.schema, args.scale)}
+        report["dataset"]["seed_seconds"] = time.perf_counter() - started
+
+    url = load_section("mcp_client").get("url", "http://localhost:8080/mcp")
+    server = start_server(url, dsn, args.schema) if args.start_server else None
+    try:
+        if "mcp" in args.components:
+            report["mcp"] = await bench_mcp(url, args.requests, args.concurrency)
+            if server:
+                report["mcp"]["memory"] = memory_stats(server.pid)
+        if "router" in args.components:
+            report["router"] = await bench_router(args.requests, args.concurrency, args.fake_model, args.tokens_per_second)
+            report["router"]["memory"] = memory_stats()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        if embedded:
+            embedded.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="asyncpg DSN of the benchmark database (needed with --seed)")
+    parser.add_argument("--embedded", action="store_true", help="use a throwaway embedded Postgres (pgserver)")
+    parser.add_argument("--schema", default="music")
+    parser.add_argument("--seed", action="store_true", help="(re)create and fill the schema first")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--components", default="mcp,router", help="comma separated: mcp, router")
+    parser.add_argument("--requests", type=int, default=200, help="requests per workload")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--start-server", action="store_true", help="launch server.py and report its memory")
+    parser.add_argument("--fake-model", action="store_true", help="deterministic stand-in for the llama model")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="simulated decode rate of the fake model, 0 for instant")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    if args.seed and not (args.dsn or args.embedded):
+        parser.error("--seed needs --dsn or --embedded")
+    args.components = [c.strip() for c in args.components.split(",") if c.strip()]
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Seeds a synthetic `music` schema (record_label, artist, genre, album, track)
+for benchmarking. Sizes scale linearly with `scale`; values are derived
+from the row ids, so every run with the same scale produces the same data.
+
+    python -m benchmarks.seed_music --dsn postgresql://localhost/bench --scale 10
+"""
+import argparse
+import asyncio
+import logging
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Rows per unit of scale.
+LABELS = 20
+ARTISTS = 200
+GENRES = 2
+ALBUMS = 1000
+TRACKS_PER_ALBUM = 12
+
+SCHEMA_DDL = """
+    DROP SCHEMA IF EXISTS {schema} CASCADE;
+    CREATE SCHEMA {schema};
+    SET search_path = {schema};
+
+    CREATE TABLE record_label (
+        label_id integer PRIMARY KEY,
+        label_name text NOT NULL,
+        country text
+    );
+    CREATE TABLE artist (
+        artist_id integer PRIMARY KEY,
+        name text NOT NULL
+    );
+    CREATE TABLE genre (
+        genre_id integer PRIMARY KEY,
+        name text NOT NULL
+    );
+    CREATE TABLE album (
+        album_id integer PRIMARY KEY,
+        title text NOT NULL,
+        release_year integer,
+        label_id integer REFERENCES record_label (label_id),
+        artist_id integer REFERENCES artist (artist_id)
+    );
+    CREATE TABLE track (
+        track_id integer PRIMARY KEY,
+        title text NOT NULL,
+        duration integer,
+        position integer,
+        release_year integer,
+        genre_id integer REFERENCES genre (genre_id),
+        label_id integer REFERENCES record_label (label_id),
+        artist_id integer REFERENCES artist (artist_id),
+        album_id integer REFERENCES album (album_id)
+    );
+"""
+
+# Foreign keys are spread with a multiplicative hash so joins are not
+# trivially ordered; $n parameters are the table sizes.
+DATA_STATEMENTS = [
+    ("record_label", """
+        INSERT INTO record_label
+        SELECT i, 'Label ' || i, (ARRAY['JM', 'UK', 'US', 'TT', 'NG'])[1 + i % 5]
+        FROM generate_series(1, $1) AS i
+    """),
+    ("artist", """
+        INSERT INTO artist
+        SELECT i, 'Artist ' || i
+        FROM generate_series(1, $1) AS i
+    """),
+    ("genre", """
+        INSERT INTO genre
+        SELECT i, 'Genre ' || i
+        FROM generate_series(1, $1) AS i
+    """),
+    ("album", """
+        INSERT INTO album
+        SELECT i, 'Album ' || i, 1960 + i % 65,
+               1 + (i::bigint * 7919) % $2, 1 + (i::bigint * 104729) % $3
+        FROM generate_series(1, $1) AS i
+    """),
+    ("track", """
+        INSERT INTO track
+        SELECT t, 'Track ' || t, 90 + (t * 31) % 420, 1 + (t - 1) % $2,
+               a.release_year, 1 + (t * 13) % $3, a.label_id, a.artist_id, a.album_id
+        FROM generate_series(1, $1) AS t
+        JOIN album a ON a.album_id = 1 + (t - 1) / $2
+    """),
+]
+
+INDEX_DDL = """
+    CREATE INDEX ON album (label_id);
+    CREATE INDEX ON album (artist_id);
+    CREATE INDEX ON track (album_id);
+    CREATE INDEX ON track (artist_id);
+    CREATE INDEX ON track (genre_id);
+    ANALYZE;
+"""
+
+
+def table_sizes(scale: int) -> dict[str, int]:
+    albums = ALBUMS * scale
+    return {
+        "record_label": LABELS * scale,
+        "artist": ARTISTS * scale,
+        "genre": GENRES * scale,
+        "album": albums,
+        "track": albums * TRACKS_PER_ALBUM,
+    }
+
+
+async def seed(dsn: str, schema: str = "music", scale: int = 1) -> dict[str, int]:
+    """
+    (Re)creates `schema` and fills it. Returns the row count per table.
+    """
+    sizes = table_sizes(scale)
+    args = {
+        "record_label": (sizes["record_label"],),
+        "artist": (sizes["artist"],),
+        "genre": (sizes["genre"],),
+        "album": (sizes["album"], sizes["record_label"], sizes["artist"]),
+        "track": (sizes["track"], TRACKS_PER_ALBUM, sizes["genre"]),
+    }
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(SCHEMA_DDL.format(schema=schema))
+        for table, statement in DATA_STATEMENTS:
+            await conn.execute(statement, *args[table])
+            logger.info(f"Seeded {sizes[table]} rows into {schema}.{table}")
+        await conn.execute(INDEX_DDL)
+    finally:
+        await conn.close()
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="asyncpg DSN, e.g. postgresql://user@localhost/bench")
+    parser.add_argument("--schema", default="music")
+    parser.add_argument("--scale", type=int, default=1, help=f"{ALBUMS} albums and {ALBUMS * TRACKS_PER_ALBUM} tracks per unit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(seed(args.dsn, args.schema, args.scale)))
+
+
+if __name__ == "__main__":
+    main()
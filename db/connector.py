@@ -1,35 +1,42 @@
 import asyncpg
 import logging
 from typing import Optional
-from src.config import load_db_config
+from src.config import load_db_config, load_section
+from services.statement_cache import StatementCache
 
 logger = logging.getLogger(__name__)
 
 class Database:
     """
     A PostgreSQL async database wrapper that manages schema scoping using asyncpg.
-    Ensures `search_path` is set for each acquired connection.
+    `search_path` is sent as a startup parameter, so every pooled connection
+    has it from the start without an extra round trip per query.
     """
     __db_config = load_db_config()
+    __pool_config = load_section("pool")
+    __query_config = load_section("query")
 
     def __init__(self, schema_name: str):
         self.schema_name = schema_name
         self._quoted_schema = self._quote_ident(schema_name)
         self._pool: Optional[asyncpg.Pool] = None
+        self._statement_cache_size = int(self.__query_config.get("statement_cache_size", 100))
+        self._statements = StatementCache(self._statement_cache_size)
 
     async def connect(self) -> None:
         """
-        Initialize the connection pool and set up the search path for new connections.
+        Initialize the connection pool with the search path as a server setting.
+        Unlike a SET in an `init` hook, it survives the RESET ALL run on release.
         """
-        async def _setup_connection(conn: asyncpg.Connection):
-            await conn.execute(f"SET search_path TO {self._quoted_schema}")
-            val = await conn.fetchval("SHOW search_path")
-            logger.debug(f"New connection setup with search_path: {val}")
-
         logger.info("Connecting to the database...")
         self._pool = await asyncpg.create_pool(
             **self.__db_config,
-            init=_setup_connection
+            min_size=int(self.__pool_config.get("min_size", 2)),
+            max_size=int(self.__pool_config.get("max_size", 10)),
+            max_inactive_connection_lifetime=float(self.__pool_config.get("max_inactive_connection_lifetime", 300)),
+            max_queries=int(self.__pool_config.get("max_queries", 50000)),
+            server_settings={"search_path": self._quoted_schema},
+            statement_cache_size=self._statement_cache_size
         )
         logger.info("Database pool created successfully.")
 
@@ -44,22 +51,44 @@ class Database:
     async def fetch(self, query: str, *args) -> list[dict]:
         """
         Executes a SELECT query and returns results as a list of dictionaries.
-        Ensures `search_path` is set per connection acquired from the pool.
+        Queries without arguments have their literals parameterized so that
+        repeated shapes reuse a prepared statement on the connection.
         """
         if not self._pool:
             raise RuntimeError("Database connection pool is not initialized.")
 
         try:
-            async with self._pool.acquire() as conn:
-                async with conn.transaction(readonly=True):
-                    await conn.execute(f'SET search_path TO {self._quoted_schema}')
-                    rows = await conn.fetch(query, *args)
+            # A statement gone stale after DDL aborts the transaction; retry once in a new one.
+            for attempt in range(2):
+                async with self._pool.acquire() as conn:
+                    text, bound, _ = await self._statements.prepare(conn, query)
+                    try:
+                        async with conn.transaction(readonly=True):
+                            rows = await conn.fetch(text, *(args or bound))
+                    except Exception as e:
+                        if self._statements.invalidate(text, e) and not attempt:
+                            continue
+                        raise
                     logger.debug(f"Executed query: {query}")
                     return [dict(row) for row in rows]
         except Exception as e:
             logger.exception(f"Error executing query: {query}")
             raise
 
+    def stats(self) -> dict:
+        """
+        Current pool occupancy and prepared-statement cache counters.
+        """
+        if not self._pool:
+            return {}
+        return {
+            "size": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "statements": self._statements.stats(),
+        }
+
     def _quote_ident(self, ident: str) -> str:
         """
         Properly quotes an SQL identifier to prevent injection.
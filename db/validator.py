@@ -1,5 +1,7 @@
 import re
 
+FORBIDDEN_KEYWORDS = ["insert", "update", "delete", "drop", "create", "alter", ";", "--"]
+
 def is_safe_query(query: str) -> bool:
     """
     Allow only SELECT statements, block others.
@@ -9,5 +11,14 @@ def is_safe_query(query: str) -> bool:
     # Only allow statements starting with 'select' and block other SQL keywords
     if not query.startswith("select"):
         return False
-    forbidden_keywords = ["insert", "update", "delete", "drop", "create", "alter", ";", "--"]
-    return not any(keyword in query for keyword in forbidden_keywords)
+    return not any(keyword in query for keyword in FORBIDDEN_KEYWORDS)
+
+def is_safe_prefix(partial: str) -> bool:
+    """
+    False as soon as `partial` can no longer grow into a query that passes
+    is_safe_query, so streamed generation can be stopped early.
+    """
+    partial = partial.lstrip().lower()
+    if not (partial.startswith("select") or "select".startswith(partial)):
+        return False
+    return not any(keyword in partial for keyword in FORBIDDEN_KEYWORDS)
@@ -1,15 +1,112 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import partial
+from contextlib import asynccontextmanager, closing
 from fastapi import APIRouter, FastAPI, HTTPException
-from fastmcp import Client
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from db.validator import is_safe_prefix, is_safe_query
+from src.config import load_section
+from src.inference_scheduler import InferenceQueueFullError, InferenceScheduler, InferenceTimeoutError
 from src.llama_model_manager import LlamaModelManager
-from src.operation_timer import CallTimer
-from typing import List, Dict
+from src.mcp_client_pool import McpClientPool
+from src.metrics import OPERATION_SECONDS, REGISTRY
+from src.operation_timer import OperationTimer
+from src.sql_generation_cache import SqlGenerationCache
+from src.startup_tracker import StartupTracker
+from typing import AsyncIterator, Callable, List, Dict
 from models.query_models import QueryRequest, QueryResponse
+from services.shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# Heavy imports (llama_cpp, fastmcp) are deferred to the warm-up below.
+startup = StartupTracker("model_load", "prompt_prime", "mcp_connect")
+
+# --- MCP Client Pool ---
+mcp_client_config = load_section("mcp_client")
+mcp_pool = McpClientPool(
+    url=mcp_client_config.get("url", "http://localhost:8080/mcp"),
+    size=int(mcp_client_config.get("pool_size", 4)),
+    health_check_interval=float(mcp_client_config.get("health_check_interval", 30)),
+    acquire_timeout=float(mcp_client_config.get("acquire_timeout", 10)),
+)
+
+# --- Inference Scheduler ---
+inference_config = load_section("inference")
+inference_scheduler = InferenceScheduler(
+    workers=int(inference_config.get("workers", LlamaModelManager.get_instance().pool_size)),
+    max_queue=int(inference_config.get("max_queue", 8)),
+    timeout=float(inference_config.get("timeout", 120)),
+)
+
+# --- Question -> SQL Cache ---
+generation_cache_config = load_section("generation_cache")
+generation_cache = SqlGenerationCache(
+    path=generation_cache_config.get("path") or None,
+    max_entries=int(generation_cache_config.get("max_entries", 1000)),
+    similarity_threshold=float(generation_cache_config.get("similarity_threshold", 0)),
+    save_every=int(generation_cache_config.get("save_every", 20)),
+    # Shared with the other router workers when run under `uvicorn --workers N`.
+    store=SharedStore(generation_cache_config["shared_dir"]) if generation_cache_config.get("shared_dir") else None,
+)
+
+REGISTRY.register_stats("mcp_pool", mcp_pool.stats)
+REGISTRY.register_stats("inference", inference_scheduler.stats)
+REGISTRY.register_stats("model_pool", lambda: LlamaModelManager.get_instance().stats())
+REGISTRY.register_stats("generation_cache", generation_cache.stats)
+REGISTRY.register_stats("startup", startup.stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    generation_cache.load()
+    # Serve health checks at once and warm up behind them; the orchestrator
+    # routes traffic once /readyz passes. Earlier questions wait for the model.
+    warm_up = asyncio.create_task(warm_up_in_background())
+    yield
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    generation_cache.save()
+    await mcp_pool.close()
+    inference_scheduler.shutdown()
+
+async def warm_up_in_background() -> None:
+    await asyncio.gather(load_model(), connect_mcp())
+
+async def load_model() -> None:
+    try:
+        async with startup.phase("model_load"):
+            # Every context in the pool, not just the first one a question needs.
+            await asyncio.get_running_loop().run_in_executor(None, LlamaModelManager.get_instance().warm_up)
+        async with startup.phase("prompt_prime"):
+            await prime_prompt_cache()
+    except Exception:
+        logger.exception("Model warm-up failed; /readyz will keep failing")
+
+async def connect_mcp(retry_interval: float = 2.0) -> None:
+    """
+    Opens the session pool, then waits until the MCP server answers with a
+    loaded schema, which means its database pool is up as well.
+    """
+    await mcp_pool.start()
+    while True:
+        try:
+            async with startup.phase("mcp_connect"):
+                async with mcp_pool.session() as client:
+                    await client.read_resource("schema://fingerprint")
+            return
+        except Exception as e:
+            logger.info(f"MCP server not ready yet: {e}")
+            await asyncio.sleep(retry_interval)
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="SQL Generator API",
     description="This API takes a natural language question and returns a Postgres SQL query based on the database schema context.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- APIRouter Initialization ---
@@ -50,8 +147,65 @@ def create_messages(question: str, context: str) -> List[Dict[str, str]]:
     ]
 
 
+async def prime_prompt_cache() -> None:
+    """
+    Evaluates the fixed system prompt and few-shot prefix once per model
+    context. The schema context is chosen per question, so it is not primed.
+    """
+    llama_model = LlamaModelManager.get_instance()
+    await asyncio.get_running_loop().run_in_executor(
+        None, partial(llama_model.prime, messages=create_messages("", ""))
+    )
+
+
+# --- Blocking Inference (runs on the scheduler's threads) ---
+# Decoding stops at the end of the first statement instead of running on to max_tokens.
+GENERATION_PARAMS = {"temperature": 0.2, "top_p": 0.8, "max_tokens": 1024, "stop": [";"]}
+
+def generate_completion(messages: List[Dict[str, str]]) -> dict:
+    llama_model = LlamaModelManager.get_instance()
+    return llama_model.create_chat_completion(messages=messages, **GENERATION_PARAMS)
+
+
+def stream_completion(messages: List[Dict[str, str]], emit: Callable[[str], None], cancelled: threading.Event) -> dict:
+    """
+    Emits SQL text as it is decoded. Stops at the first ';', as soon as the
+    output can no longer become a safe SELECT, or when `cancelled` is set.
+    Returns the statement (without the ';') and why generation stopped.
+    """
+    llama_model = LlamaModelManager.get_instance()
+    sql = ""
+    with closing(llama_model.stream_chat_completion(messages=messages, **GENERATION_PARAMS)) as stream:
+        for chunk in stream:
+            if cancelled.is_set():
+                return {"sql": sql, "stop": "cancelled"}
+            text = chunk["choices"][0]["delta"].get("content") or ""
+            text, terminated, _ = text.partition(";")
+            if not is_safe_prefix(sql + text):
+                return {"sql": sql + text, "stop": "unsafe"}
+            if text:
+                sql += text
+                emit(text)
+            if terminated:
+                return {"sql": sql, "stop": "terminator"}
+    return {"sql": sql, "stop": "end"}
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def is_successful(result) -> bool:
+    """
+    execute_query reports failures as text, so only cache SQL that ran cleanly.
+    """
+    if getattr(result, "is_error", False):
+        return False
+    text = getattr(result.content[0], "text", "") if result.content else ""
+    return not text.startswith(("Error:", "Only SELECT"))
+
+
 # --- Endpoint Logic ---
-@CallTimer
 @router.post(
     "",
     response_model=QueryResponse,
@@ -64,28 +218,145 @@ This endpoint takes a natural language question, uses a preloaded schema context
 It uses a language model to convert the prompt and few-shot examples into SQL.
 """
 )
+@OperationTimer("request")
 async def generate_sql_query(request: QueryRequest) -> QueryResponse:
     try:
-        async with Client("http://localhost:8080/mcp") as client:
-            schema_resource = await client.read_resource("schema://analysis")
-            schema = schema_resource[0].text
-
-            llama_model = LlamaModelManager.get_instance()
-            response = llama_model.create_chat_completion(
-                messages=create_messages(request.question, schema),
-                temperature=0.2,
-                top_p=0.8,
-                max_tokens=1024
-            )
+        # Sessions are only held around MCP calls, not during generation.
+        async with mcp_pool.session() as client:
+            async with OperationTimer("schema_fetch"):
+                fingerprint_resource = await client.read_resource("schema://fingerprint")
+                fingerprint = fingerprint_resource[0].text
+                sql = generation_cache.get(request.question, fingerprint)
+                if sql is None:
+                    schema_result = await client.call_tool("get_relevant_schema", {"question": request.question})
+                    schema = schema_result.content[0].text
 
+        generated = sql is None
+        if generated:
+            with OperationTimer("prompt_build"):
+                messages = create_messages(request.question, schema)
+            # Includes time queued for a model context; "generation" excludes it.
+            async with OperationTimer("inference"):
+                response = await inference_scheduler.run(generate_completion, messages)
             sql = response["choices"][0]["message"]["content"].strip()
-            result = await client.call_tool("execute_query", {"sql": sql})
 
-            return QueryResponse(sql=sql, result=result.content)
+        async with mcp_pool.session() as client:
+            async with OperationTimer("sql_execution"):
+                result = await client.call_tool("execute_query", {"sql": sql})
+
+        if generated and is_successful(result):
+            generation_cache.put(request.question, fingerprint, sql)
 
+        return QueryResponse(sql=sql, result=result.content)
+
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except InferenceTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         # Optional: log traceback here
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
+@router.post(
+    "/stream",
+    summary="Stream SQL generation for a natural language question",
+    description="""
+Server-sent events for the same pipeline as POST /query:
+- `token`: SQL text as the model produces it (`{"text": ...}`)
+- `sql`: the complete statement (`{"sql": ..., "cached": bool}`)
+- `result`: the execute_query result content
+- `error`: `{"detail": ...}`; generation is aborted as soon as the output can no longer be a safe SELECT
+
+Generation stops at the first `;`.
+"""
+)
+async def stream_sql_query(request: QueryRequest) -> StreamingResponse:
+    return StreamingResponse(sql_query_events(request.question), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def sql_query_events(question: str) -> AsyncIterator[str]:
+    cancelled = threading.Event()
+    job = None
+    try:
+        async with mcp_pool.session() as client:
+            async with OperationTimer("schema_fetch"):
+                fingerprint_resource = await client.read_resource("schema://fingerprint")
+                fingerprint = fingerprint_resource[0].text
+                sql = generation_cache.get(question, fingerprint)
+                if sql is None:
+                    schema_result = await client.call_tool("get_relevant_schema", {"question": question})
+                    schema = schema_result.content[0].text
+
+        generated = sql is None
+        if generated:
+            loop = asyncio.get_running_loop()
+            tokens: asyncio.Queue = asyncio.Queue()
+            emit = partial(loop.call_soon_threadsafe, tokens.put_nowait)
+            with OperationTimer("prompt_build"):
+                messages = create_messages(question, schema)
+
+            started = time.perf_counter()
+            job = asyncio.ensure_future(inference_scheduler.run(stream_completion, messages, emit, cancelled))
+            # Queued after every token the job emitted, whether it finishes or fails.
+            job.add_done_callback(lambda _: tokens.put_nowait(None))
+            first_token = True
+            while (text := await tokens.get()) is not None:
+                if first_token:
+                    OPERATION_SECONDS.observe(time.perf_counter() - started, "first_token")
+                    first_token = False
+                yield sse("token", {"text": text})
+            outcome = await job
+
+            sql = outcome["sql"].strip()
+            if outcome["stop"] == "unsafe" or not is_safe_query(sql):
+                yield sse("error", {"detail": "Generated statement is not a safe SELECT; generation aborted.", "sql": sql})
+                return
+
+        yield sse("sql", {"sql": sql, "cached": not generated})
+
+        async with mcp_pool.session() as client:
+            async with OperationTimer("sql_execution"):
+                result = await client.call_tool("execute_query", {"sql": sql})
+
+        if generated and is_successful(result):
+            generation_cache.put(question, fingerprint, sql)
+
+        yield sse("result", [content.model_dump() for content in result.content])
+
+    except InferenceQueueFullError as e:
+        yield sse("error", {"detail": str(e), "status": 503})
+    except InferenceTimeoutError as e:
+        yield sse("error", {"detail": str(e), "status": 504})
+    except Exception as e:
+        yield sse("error", {"detail": f"Internal error: {str(e)}", "status": 500})
+    finally:
+        # Client gone, timed out or done: stop decoding if it is still running
+        # and drop the job if it is still queued.
+        cancelled.set()
+        if job is not None and not job.done():
+            job.cancel()
+
+@router.get("/stats", summary="Session pool, inference queue, model pool and cache statistics")
+async def stats() -> dict:
+    return {
+        "mcp_pool": mcp_pool.stats(),
+        "inference": inference_scheduler.stats(),
+        "model_pool": LlamaModelManager.get_instance().stats(),
+        "generation_cache": generation_cache.stats(),
+    }
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz() -> dict:
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz() -> JSONResponse:
+    return JSONResponse(startup.stats(), status_code=200 if startup.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # --- Register Router ---
 app.include_router(router)
@@ -1,16 +1,32 @@
 import asyncio
-import time
+import socket
 import json
+import uvicorn
 from contextlib import asynccontextmanager
-from collections import defaultdict
 from configparser import ConfigParser
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection
 from sqlalchemy import text
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from typing import Annotated, AsyncGenerator
 from pydantic import Field
+from services.batch_executor import run_batch
+from services.catalog_introspection import CATALOG_QUERY, CATALOG_VERSION_QUERY, parse_catalog
+from services.query_exporter import ExportFormat, QueryExporter
+from services.pool_limits import apply_pool_limits
+from services.query_guard import QueryGuard
+from services.result_encoding import Compression, ResultFormat, check_format, enabled_formats, encode_page, to_json
+from services.result_cache import TABLE_COUNTERS_QUERY, ResultCache
+from services.result_pager import ResultPager
+from services.schema_cache import SchemaCache
+from services.schema_index import SchemaIndex
+from services.shared_state import SharedSchemaSource, SharedStore, shared_loader
+from services.worker_pool import serve_workers
+from src.metrics import REGISTRY
+from src.operation_timer import OperationTimer
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 
 # ────────────────────────────────────────────────────────────────────────────────
 # LOAD CONFIGURATION
@@ -21,36 +37,136 @@ config.read("config.ini")
 
 DATABASE_URL = config["database"]["url"]
 DB_SCHEMA = config["database"].get("schema", "public")
+POOL_MIN_SIZE = int(config["pool"].get("min_size", 2))
+POOL_MAX_SIZE = int(config["pool"].get("max_size", 10))
+POOL_MAX_INACTIVE = float(config["pool"].get("max_inactive_connection_lifetime", 300))
+POOL_MAX_QUERIES = int(config["pool"].get("max_queries", 50000))
 SCHEMA_CACHE_TTL = int(config["cache"].get("schema_ttl", 300))
+SCHEMA_POLL_INTERVAL = float(config["cache"].get("schema_poll_interval", 5))
 SCHEMA_LIMIT = config["rate_limit"].get("schema_limit", "5/minute")
 QUERY_LIMIT = config["rate_limit"].get("query_limit", "10/minute")
 HOST = config["server"].get("host", "127.0.0.1")
 PORT = int(config["server"].get("port", 8080))
 LOG_LEVEL = config["server"].get("log_level", "INFO")
+WORKERS = int(config["server"].get("workers", 1))
+SHARED_DIR = config["server"].get("shared_dir", ".mcp_shared")
+PAGE_SIZE = int(config["query"].get("page_size", 500))
+CURSOR_IDLE_TIMEOUT = int(config["query"].get("cursor_idle_timeout", 120))
+MAX_OPEN_CURSORS = int(config["query"].get("max_open_cursors", 8))
+BATCH_MAX_PARALLEL = int(config["query"].get("batch_max_parallel", 4))
+BATCH_STATEMENT_TIMEOUT = float(config["query"].get("batch_statement_timeout", 30))
+RESULT_FORMATS = enabled_formats(config["query"].get("result_formats", "rows, columnar"))
+SCHEMA_TOP_K = int(config["schema_context"].get("top_k", 5))
+SCHEMA_TOKEN_BUDGET = int(config["schema_context"].get("token_budget", 1200))
+GUARD_ENABLED = config["guard"].getboolean("enabled", True)
+GUARD_MAX_COST = float(config["guard"].get("max_cost", 0))
+GUARD_MAX_ROWS = int(config["guard"].get("max_rows", 0))
+GUARD_MAX_SEQ_SCAN_ROWS = int(config["guard"].get("max_seq_scan_rows", 0))
+GUARD_DEFAULT_LIMIT = int(config["guard"].get("default_limit", 0))
+STATEMENT_TIMEOUT_MS = int(config["guard"].get("statement_timeout_ms", 0))
+RESULT_CACHE_ENABLED = config["result_cache"].getboolean("enabled", False)
+RESULT_CACHE_MAX_BYTES = int(config["result_cache"].get("max_bytes", 64 << 20))
+RESULT_CACHE_TTL = float(config["result_cache"].get("ttl", 60))
+RESULT_CACHE_POLL_INTERVAL = float(config["result_cache"].get("poll_interval", 2))
+EXPORT_DIRECTORY = config["export"].get("directory", "exports")
+EXPORT_STATEMENT_TIMEOUT_MS = int(config["export"].get("statement_timeout_ms", 0))
+EXPORT_RETENTION = float(config["export"].get("retention", 86400))
+
+if MAX_OPEN_CURSORS >= POOL_MAX_SIZE:
+    # Each open cursor holds a connection; the rest of the server needs at least one.
+    raise ValueError(f"[query] max_open_cursors ({MAX_OPEN_CURSORS}) must be below [pool] max_size ({POOL_MAX_SIZE}).")
 
 # ────────────────────────────────────────────────────────────────────────────────
 # DATABASE SETUP
 # ────────────────────────────────────────────────────────────────────────────────
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+# search_path is an asyncpg startup parameter, so each physical connection
+# gets it once instead of a SET round trip on every checkout.
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=True,
+    future=True,
+    pool_size=POOL_MIN_SIZE,
+    max_overflow=max(0, POOL_MAX_SIZE - POOL_MIN_SIZE),
+    connect_args={"server_settings": {"search_path": DB_SCHEMA}},
+)
+apply_pool_limits(engine, POOL_MAX_INACTIVE, POOL_MAX_QUERIES)
 
 @asynccontextmanager
 async def get_conn() -> AsyncGenerator[AsyncConnection, None]:
     async with engine.connect() as conn:
-        await conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
         yield conn
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    yield
-    await engine.dispose()
+def pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_size": POOL_MAX_SIZE,
+    }
 
-# ────────────────────────────────────────────────────────────────────────────────
-# INIT FASTAPI
-# ────────────────────────────────────────────────────────────────────────────────
+class StreamedResult:
+    """
+    Server-side cursor over a dedicated connection, consumed by the ResultPager.
+    """
+    def __init__(self, conn: AsyncConnection, result, plan: dict, limit_applied: int | None = None):
+        self.conn = conn
+        self.result = result
+        self.columns = list(result.keys())
+        self.plan = plan
+        self.limit_applied = limit_applied
+
+    @classmethod
+    async def open(cls, sql: str, table_rows: dict[str, int] | None = None) -> "StreamedResult":
+        conn = await engine.connect()
+        try:
+            if guard.timeout_statement:
+                await conn.execute(text(guard.timeout_statement))
+
+            async def explain(statement: str):
+                return (await conn.execute(text(statement))).scalar()
+
+            sql, limit_applied = guard.rewrite(sql)
+            sql, plan = await guard.review(sql, explain, table_rows)
+            result = await conn.stream(text(sql))
+        except BaseException:
+            # Includes cancellation, e.g. a batch statement timing out.
+            await conn.close()
+            raise
+        return cls(conn, result, plan, limit_applied)
 
-app = FastAPI(lifespan=lifespan)
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    async def fetch(self, n: int):
+        return await self.result.fetchmany(n)
+
+    async def close(self) -> None:
+        try:
+            await self.result.close()
+        finally:
+            await self.conn.close()
+
+pager = ResultPager(PAGE_SIZE, CURSOR_IDLE_TIMEOUT, MAX_OPEN_CURSORS)
+guard = QueryGuard(
+    enabled=GUARD_ENABLED,
+    max_cost=GUARD_MAX_COST,
+    max_rows=GUARD_MAX_ROWS,
+    max_seq_scan_rows=GUARD_MAX_SEQ_SCAN_ROWS,
+    default_limit=GUARD_DEFAULT_LIMIT,
+    statement_timeout_ms=STATEMENT_TIMEOUT_MS,
+)
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    try:
+        yield
+    finally:
+        await result_cache.stop()
+        await schema_cache.stop()
+        await pager.close_all()
+        await engine.dispose()
+        if shared_store:
+            shared_store.close()
 
 # ────────────────────────────────────────────────────────────────────────────────
 # INIT FASTMCP
@@ -58,11 +174,16 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], all
 
 mcp = FastMCP(
     name="Postgres MCP Server",
-    app=app,
     instructions="""
         This server provides data analysis tools.
-        Use get_schema() to inspect tables.
-        Use execute_query(sql) to run queries.
+        Use get_schema() to inspect tables, or get_relevant_schema(question)
+        for only the tables relevant to a question.
+        Use execute_query(sql) to run queries, or execute_queries(statements)
+        to run several independent ones concurrently. SELECT results are paged;
+        pass the returned next_token to fetch_next_page(token) for more rows.
+        truncated is true when the result stopped at a LIMIT the server added;
+        add your own LIMIT or filter to control what is returned.
+        For large extracts use export_query(sql) to write a CSV file instead.
     """,
     transport="http", 
     host=HOST, 
@@ -71,42 +192,137 @@ mcp = FastMCP(
     tools=[]
 )
 
-_schema_cache = None
-_schema_cache_ts = 0
+@OperationTimer("schema_fetch")
+async def fetch_schema() -> SchemaIndex:
+    async with get_conn() as conn:
+        result = await conn.execute(text(CATALOG_QUERY.format(schema=":schema")), {"schema": DB_SCHEMA})
+        return SchemaIndex(parse_catalog(result.scalar()))
 
-async def fetch_schema() -> str:
-    query = text("""
-        SELECT table_name, column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = :schema
-        ORDER BY table_name, ordinal_position
-    """)
+async def fetch_catalog_version() -> str:
     async with get_conn() as conn:
-        result = await conn.execute(query, {"schema": DB_SCHEMA})
-        rows = result.fetchall()
+        result = await conn.execute(text(CATALOG_VERSION_QUERY.format(schema=":schema")), {"schema": DB_SCHEMA})
+        return result.scalar()
 
-    grouped = defaultdict(list)
-    for table, column, dtype in rows:
-        grouped[table].append(f"  {column}: {dtype}")
-    return "\n".join(f"{table}:\n" + "\n".join(cols) for table, cols in grouped.items())
+# With several workers only the leader queries the catalog; the others read its snapshot.
+shared_store = SharedStore(SHARED_DIR) if WORKERS > 1 else None
+if shared_store:
+    schema_source = SharedSchemaSource(shared_store, fetch_schema, fetch_catalog_version)
+    schema_cache = SchemaCache(schema_source.load, schema_source.probe_version, SCHEMA_POLL_INTERVAL, SCHEMA_CACHE_TTL)
+else:
+    schema_cache = SchemaCache(fetch_schema, fetch_catalog_version, SCHEMA_POLL_INTERVAL, SCHEMA_CACHE_TTL)
+
+async def fetch_table_counters() -> dict[str, str]:
+    async with get_conn() as conn:
+        result = await conn.execute(text(TABLE_COUNTERS_QUERY.format(schema=":schema")), {"schema": DB_SCHEMA})
+        return {table: count for table, count in result.fetchall()}
+
+result_cache = ResultCache(
+    shared_loader(shared_store, "table_counters", fetch_table_counters) if shared_store else fetch_table_counters,
+    RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL, RESULT_CACHE_POLL_INTERVAL, shared_store,
+)
+
+REGISTRY.register_stats("db_pool", pool_stats)
+REGISTRY.register_stats("result_cache", result_cache.stats)
+
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok"})
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readyz(request: Request) -> JSONResponse:
+    # The first probe starts the schema load; ready once the database has answered it.
+    try:
+        snapshot = await asyncio.wait_for(schema_cache.get(), timeout=5)
+    except Exception as e:
+        return JSONResponse({"ready": False, "error": f"{type(e).__name__}: {e}"}, status_code=503)
+    return JSONResponse({"ready": True, "schema_version": snapshot.version, "pool": pool_stats()})
+
+exporter = QueryExporter(EXPORT_DIRECTORY, EXPORT_STATEMENT_TIMEOUT_MS, EXPORT_RETENTION)
+
+@mcp.custom_route("/exports/{name}", methods=["GET"])
+async def download_export(request: Request) -> Response:
+    path = exporter.download_path(request.path_params["name"])
+    if path is None:
+        return JSONResponse({"error": "Unknown export."}, status_code=404)
+    # Sent in fixed-size chunks straight from the file.
+    return FileResponse(path, filename=request.path_params["name"])
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @mcp.resource("schema://analysis")
 async def get_schema() -> str:
-    global _schema_cache, _schema_cache_ts
-    now = time.time()
-    if not _schema_cache or (now - _schema_cache_ts) > SCHEMA_CACHE_TTL:
-        _schema_cache = await fetch_schema()
-        _schema_cache_ts = now
-    return _schema_cache
+    return (await schema_cache.get()).text
+
+@mcp.resource("schema://catalog", mime_type="application/json")
+async def get_schema_catalog() -> str:
+    return json.dumps((await schema_cache.get()).index.catalog)
+
+@mcp.resource("schema://fingerprint")
+async def get_schema_fingerprint() -> str:
+    return (await schema_cache.get()).fingerprint
+
+@mcp.resource("stats://pool", mime_type="application/json")
+async def get_pool_stats() -> str:
+    return json.dumps(pool_stats())
+
+@mcp.resource("stats://result-cache", mime_type="application/json")
+async def get_result_cache_stats() -> str:
+    return json.dumps(result_cache.stats())
+
+@mcp.tool()
+async def get_relevant_schema(
+    question: Annotated[str, Field(description="Natural language question the SQL should answer")],
+    top_k: Annotated[int | None, Field(description="Most relevant tables to include before FK neighbours", gt=0)] = None,
+    token_budget: Annotated[int | None, Field(description="Approximate token budget for the schema text", gt=0)] = None,
+) -> str:
+    snapshot = await schema_cache.get()
+    return snapshot.index.select(question, top_k or SCHEMA_TOP_K, token_budget or SCHEMA_TOKEN_BUDGET)
 
 @mcp.tool()
 async def execute_query(
     sql: Annotated[ str, Field( description="SQL SELECT statement")],
+    page_size: Annotated[int | None, Field(description="Rows per page (defaults to server setting)", gt=0)] = None,
+    use_cache: Annotated[bool, Field(description="Serve an identical recent result from the result cache if enabled")] = True,
+    format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+    compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
 ):
+    return to_json(await run_query(sql, page_size, use_cache, format, compression))
+
+async def run_query(sql: str, page_size: int | None = None, use_cache: bool = True,
+                    format: ResultFormat = "rows", compression: Compression = "none"):
+    """
+    execute_query's body. @mcp.tool() replaces the tool function with a
+    FunctionTool, so execute_queries calls this instead.
+    """
     # start_time = time.time()
     try:
         if not sql.lower().startswith(("select", "insert", "update", "delete")):
             return "Only SELECT, INSERT, UPDATE, DELETE statements are allowed."
+        check_format(format, RESULT_FORMATS)
+
+        if sql.lower().startswith("select"):
+            snapshot = await schema_cache.get()
+            cache_key, versions = None, None
+            if RESULT_CACHE_ENABLED and use_cache:
+                tables = ResultCache.referenced_tables(sql, snapshot.index.catalog, DB_SCHEMA)
+                if tables:
+                    cache_key = ResultCache.key(sql, DB_SCHEMA)
+                    cached = result_cache.get(cache_key)
+                    if cached is not None and len(cached["rows"]) <= (page_size or PAGE_SIZE):
+                        return encode_page({**cached, "cached": True}, format, compression)
+                    versions = result_cache.versions(tables)
+
+            async with OperationTimer("sql_execution"):
+                source = await StreamedResult.open(sql, snapshot.index.row_estimates)
+                page = await pager.open(source, page_size)
+            if source.plan:
+                page["plan"] = source.plan
+            # Only complete results are cached; paged ones stay with their cursor.
+            if cache_key and page["next_token"] is None:
+                result_cache.put(cache_key, page, versions)
+            return encode_page(page, format, compression)
 
         async with get_conn() as conn:
             cursor_result = await conn.execute(text(sql))
@@ -116,8 +332,87 @@ async def execute_query(
     except Exception as e:
         return f"Error: {type(e).__name__}: {e}"
 
+@mcp.tool()
+async def execute_queries(
+    statements: Annotated[list[str], Field(description="Independent SQL statements to run concurrently", min_length=1)],
+    max_parallel: Annotated[int | None, Field(description="Statements run at once (capped by the server setting)", gt=0)] = None,
+    timeout: Annotated[float | None, Field(description="Seconds each statement may take (defaults to server setting)", gt=0)] = None,
+    page_size: Annotated[int | None, Field(description="Rows per page (defaults to server setting)", gt=0)] = None,
+    format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+    compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
+):
+    # Each statement takes its own pooled connection, so the batch finishes
+    # in about the time of its slowest statement.
+    return to_json(await run_batch(
+        lambda sql: run_query(sql, page_size, True, format, compression),
+        statements,
+        min(max_parallel or BATCH_MAX_PARALLEL, BATCH_MAX_PARALLEL),
+        timeout or BATCH_STATEMENT_TIMEOUT,
+    ))
+
+@mcp.tool()
+async def export_query(
+    sql: Annotated[str, Field(description="SQL SELECT statement to export")],
+    ctx: Context,
+    format: Annotated[ExportFormat, Field(description="csv (with header) or binary (PostgreSQL COPY binary)")] = "csv",
+    path: Annotated[str | None, Field(description="File path relative to the server's export directory; generated if omitted")] = None,
+):
+    async def progress(written: int, chunks: int) -> None:
+        await ctx.report_progress(progress=written, total=None)
+
+    try:
+        async with get_conn() as conn:
+            # COPY streaming is asyncpg's own API, below SQLAlchemy.
+            raw = await conn.get_raw_connection()
+            result = await exporter.export(raw.driver_connection, sql, format, path, progress)
+        if exporter.download_path(result["name"]):
+            result["download"] = f"/exports/{result['name']}"
+        return result
+    except Exception as e:
+        return f"Error: {type(e).__name__}: {e}"
+
+@mcp.tool()
+async def fetch_next_page(
+    token: Annotated[str, Field(description="next_token returned by execute_query or a previous page")],
+    format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+    compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
+):
+    try:
+        check_format(format, RESULT_FORMATS)
+        async with OperationTimer("page_fetch"):
+            page = await pager.next_page(token)
+        return to_json(encode_page(page, format, compression))
+    except Exception as e:
+        return f"Error: {type(e).__name__}: {e}"
+
+def http_app() -> Starlette:
+    """
+    The streamable HTTP app FastMCP serves, with CORS and this module's
+    lifespan around the MCP session manager's. FastMCP's own `lifespan`
+    hook runs once per MCP session, so shutdown cleanup cannot live there.
+    """
+    starlette_app = mcp.streamable_http_app()
+    starlette_app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    session_lifespan = starlette_app.router.lifespan_context
+
+    @asynccontextmanager
+    async def combined_lifespan(app: Starlette):
+        async with lifespan(app), session_lifespan(app):
+            yield
+
+    starlette_app.router.lifespan_context = combined_lifespan
+    return starlette_app
+
 async def main():
-    await mcp.run_streamable_http_async()
+    uvicorn_config = uvicorn.Config(http_app(), host=HOST, port=PORT, log_level=LOG_LEVEL.lower(), lifespan="on")
+    await uvicorn.Server(uvicorn_config).serve()
+
+async def serve_worker(sock: socket.socket):
+    uvicorn_config = uvicorn.Config(http_app(), log_level=LOG_LEVEL.lower(), lifespan="on")
+    await uvicorn.Server(uvicorn_config).serve(sockets=[sock])
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WORKERS > 1:
+        serve_workers(serve_worker, HOST, PORT, WORKERS)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+def is_error(result: Any) -> bool:
+    """
+    execute_query reports failures as text rather than raising.
+    """
+    return isinstance(result, str) and result.startswith(("Error:", "Only SELECT"))
+
+
+async def run_batch(execute: Callable[[str], Awaitable[Any]], statements: list[str], max_parallel: int,
+                    timeout: float) -> list[dict]:
+    """
+    Runs independent statements concurrently, at most `max_parallel` at a
+    time, each cancelled after `timeout` seconds (0 for no limit).
+    Results come back in input order as {"index", "sql", "result"} or
+    {"index", "sql", "error"}; one failure does not affect the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def run(index: int, sql: str) -> dict:
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(execute(sql), timeout or None)
+            except asyncio.TimeoutError:
+                return {"index": index, "sql": sql, "error": f"Error: TimeoutError: exceeded {timeout:g}s"}
+            except Exception as e:
+                return {"index": index, "sql": sql, "error": f"Error: {type(e).__name__}: {e}"}
+        if is_error(result):
+            return {"index": index, "sql": sql, "error": result}
+        return {"index": index, "sql": sql, "result": result}
+
+    return list(await asyncio.gather(*(run(index, sql) for index, sql in enumerate(statements))))
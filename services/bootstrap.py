@@ -1,6 +1,8 @@
 import asyncio
+import logging
 from services.database_config import Config
 from services.postgres_mcp_server import PostgresMcpServer
+from services.worker_pool import serve_workers
 
 async def main():
     config = Config()
@@ -8,4 +10,9 @@ async def main():
     await app.run()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    config = Config()
+    if config.workers > 1:
+        logging.basicConfig(level=config.log_level)
+        serve_workers(PostgresMcpServer(config).serve_worker, config.host, config.port, config.workers)
+    else:
+        asyncio.run(main())
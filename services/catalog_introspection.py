@@ -0,0 +1,107 @@
+import json
+
+# Both queries take the schema name as their only parameter. `{schema}` is
+# filled with the driver's placeholder: "$1" for asyncpg, ":schema" for SQLAlchemy.
+
+CATALOG_QUERY = """
+    SELECT coalesce(json_object_agg(t.relname, json_build_object(
+        'kind', t.relkind,
+        'row_estimate', greatest(t.reltuples, 0)::bigint,
+        'columns', (
+            SELECT json_agg(json_build_object(
+                'name', a.attname,
+                'type', format_type(a.atttypid, a.atttypmod),
+                'nullable', NOT a.attnotnull
+            ) ORDER BY a.attnum)
+            FROM pg_attribute a
+            WHERE a.attrelid = t.oid AND a.attnum > 0 AND NOT a.attisdropped
+        ),
+        'primary_key', (
+            SELECT json_agg(a.attname ORDER BY k.ord)
+            FROM pg_constraint c
+            CROSS JOIN unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+            WHERE c.conrelid = t.oid AND c.contype = 'p'
+        ),
+        'foreign_keys', (
+            SELECT json_agg(json_build_object(
+                'columns', (
+                    SELECT json_agg(a.attname ORDER BY k.ord)
+                    FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                ),
+                'references', r.relname,
+                'ref_columns', (
+                    SELECT json_agg(a.attname ORDER BY k.ord)
+                    FROM unnest(c.confkey) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = c.confrelid AND a.attnum = k.attnum
+                )
+            ) ORDER BY c.conname)
+            FROM pg_constraint c
+            JOIN pg_class r ON r.oid = c.confrelid
+            WHERE c.conrelid = t.oid AND c.contype = 'f'
+        ),
+        'indexes', (
+            SELECT json_agg(json_build_object(
+                'name', i.relname,
+                'unique', x.indisunique,
+                'columns', (
+                    SELECT json_agg(a.attname ORDER BY k.ord)
+                    FROM unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+                )
+            ) ORDER BY i.relname)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = t.oid
+        )
+    ) ORDER BY t.relname), json_build_object())
+    FROM pg_class t
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    WHERE n.nspname = {schema}
+      AND t.relkind IN ('r', 'p', 'v', 'm', 'f')
+      AND NOT t.relispartition
+"""
+
+# Cheap hash over the schema's relations, columns (including type modifiers,
+# NOT NULL and dropped columns), constraints and indexes; it changes on any
+# DDL that affects the catalog snapshot above. Row estimates
+# are not part of it and are picked up when the snapshot ages out.
+CATALOG_VERSION_QUERY = """
+    SELECT md5(
+        coalesce((
+            SELECT string_agg(c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':' || a.atttypid
+                              || ':' || a.atttypmod || ':' || a.attnotnull || ':' || a.attisdropped,
+                              ',' ORDER BY c.oid, a.attnum)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0
+            WHERE n.nspname = {schema} AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        ), '') || '|' ||
+        coalesce((
+            SELECT string_agg(co.oid::text, ',' ORDER BY co.oid)
+            FROM pg_constraint co
+            JOIN pg_namespace n ON n.oid = co.connamespace
+            WHERE n.nspname = {schema}
+        ), '') || '|' ||
+        coalesce((
+            SELECT string_agg(i.indexrelid::text, ',' ORDER BY i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = {schema}
+        ), '')
+    )
+"""
+
+
+def parse_catalog(value) -> dict:
+    """
+    Returns the catalog document as a dict whether the driver decoded the
+    json value or handed back its text.
+    """
+    if value is None:
+        return {}
+    if isinstance(value, (str, bytes)):
+        return json.loads(value)
+    return value
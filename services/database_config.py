@@ -1,4 +1,5 @@
 from configparser import ConfigParser
+from services.result_encoding import enabled_formats
 
 class Config:
     def __init__(self, file: str = "config.ini"):
@@ -7,9 +8,44 @@ class Config:
 
         self.database_url = config["database"]["url"]
         self.schema = config["database"].get("schema", "public")
+        self.pool_min_size = int(config["pool"].get("min_size", 2))
+        self.pool_max_size = int(config["pool"].get("max_size", 10))
+        self.pool_max_inactive_connection_lifetime = float(config["pool"].get("max_inactive_connection_lifetime", 300))
+        self.pool_max_queries = int(config["pool"].get("max_queries", 50000))
         self.schema_cache_ttl = int(config["cache"].get("schema_ttl", 300))
+        self.schema_poll_interval = float(config["cache"].get("schema_poll_interval", 5))
+        self.guard_enabled = config["guard"].getboolean("enabled", True)
+        self.guard_max_cost = float(config["guard"].get("max_cost", 0))
+        self.guard_max_rows = int(config["guard"].get("max_rows", 0))
+        self.guard_max_seq_scan_rows = int(config["guard"].get("max_seq_scan_rows", 0))
+        self.guard_default_limit = int(config["guard"].get("default_limit", 0))
+        self.statement_timeout_ms = int(config["guard"].get("statement_timeout_ms", 0))
+        self.result_cache_enabled = config["result_cache"].getboolean("enabled", False)
+        self.result_cache_max_bytes = int(config["result_cache"].get("max_bytes", 64 << 20))
+        self.result_cache_ttl = float(config["result_cache"].get("ttl", 60))
+        self.result_cache_poll_interval = float(config["result_cache"].get("poll_interval", 2))
+        self.export_directory = config["export"].get("directory", "exports")
+        self.export_statement_timeout_ms = int(config["export"].get("statement_timeout_ms", 0))
+        self.export_retention = float(config["export"].get("retention", 86400))
         self.schema_limit = config["rate_limit"].get("schema_limit", "5/minute")
         self.query_limit = config["rate_limit"].get("query_limit", "10/minute")
         self.host = config["server"].get("host", "127.0.0.1")
         self.port = int(config["server"].get("port", 8080))
-        self.log_level = config["server"].get("log_level", "INFO")
\ No newline at end of file
+        self.log_level = config["server"].get("log_level", "INFO")
+        self.workers = int(config["server"].get("workers", 1))
+        self.shared_dir = config["server"].get("shared_dir", ".mcp_shared")
+        self.schema_top_k = int(config["schema_context"].get("top_k", 5))
+        self.schema_token_budget = int(config["schema_context"].get("token_budget", 1200))
+        self.page_size = int(config["query"].get("page_size", 500))
+        self.cursor_idle_timeout = int(config["query"].get("cursor_idle_timeout", 120))
+        self.max_open_cursors = int(config["query"].get("max_open_cursors", 8))
+        if self.max_open_cursors >= self.pool_max_size:
+            # Each open cursor holds a connection; the rest of the server needs at least one.
+            raise ValueError(
+                f"[query] max_open_cursors ({self.max_open_cursors}) must be below "
+                f"[pool] max_size ({self.pool_max_size})."
+            )
+        self.statement_cache_size = int(config["query"].get("statement_cache_size", 100))
+        self.result_formats = enabled_formats(config["query"].get("result_formats", "rows, columnar"))
+        self.batch_max_parallel = int(config["query"].get("batch_max_parallel", 4))
+        self.batch_statement_timeout = float(config["query"].get("batch_statement_timeout", 30))
@@ -7,20 +7,59 @@ class Database:
     def __init__(self, config: Config):
         self.database_url = config.database_url
         self.schema = config.schema
+        self.min_size = config.pool_min_size
+        self.max_size = config.pool_max_size
+        self.max_inactive_connection_lifetime = config.pool_max_inactive_connection_lifetime
+        self.max_queries = config.pool_max_queries
+        self.statement_cache_size = config.statement_cache_size
         self.pool: asyncpg.Pool | None = None
 
     async def connect(self):
-        self.pool = await asyncpg.create_pool(dsn=self.database_url)
+        # search_path is a startup parameter, so it is set once per physical
+        # connection and survives the RESET ALL asyncpg runs on release.
+        # asyncpg keeps up to statement_cache_size prepared statements per connection.
+        self.pool = await asyncpg.create_pool(
+            dsn=self.database_url,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+            max_queries=self.max_queries,
+            server_settings={"search_path": self.schema},
+            statement_cache_size=self.statement_cache_size,
+        )
 
     async def dispose(self):
         if self.pool:
             await self.pool.close()
 
+    async def acquire(self) -> asyncpg.Connection:
+        """
+        Checks out a connection that outlives a single `get_conn` block,
+        e.g. one holding an open cursor. Return it with `release`.
+        """
+        if not self.pool:
+            raise RuntimeError("Database connection pool is not initialized.")
+
+        return await self.pool.acquire()
+
+    async def release(self, conn: asyncpg.Connection) -> None:
+        if self.pool:
+            await self.pool.release(conn)
+
     @asynccontextmanager
     async def get_conn(self) -> AsyncGenerator[asyncpg.Connection, None]:
         if not self.pool:
             raise RuntimeError("Database connection pool is not initialized.")
-        
+
         async with self.pool.acquire() as conn:
-            await conn.execute(f"SET search_path TO {self.schema}")
             yield conn
+
+    def stats(self) -> dict:
+        if not self.pool:
+            return {}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+        }
@@ -1,33 +1,68 @@
-from collections import defaultdict
-import time
-from sqlalchemy import text
+from services.catalog_introspection import CATALOG_QUERY, CATALOG_VERSION_QUERY, parse_catalog
+from services.database_handler import Database
+from services.result_cache import TABLE_COUNTERS_QUERY
+from services.schema_cache import SchemaCache
+from services.schema_index import SchemaIndex
+from services.shared_state import SharedSchemaSource, SharedStore
+from src.operation_timer import OperationTimer
 
 class DatabaseSchemaService:
-    def __init__(self, db: Database, ttl: int):
+    def __init__(self, db: Database, ttl: int, top_k: int = 5, token_budget: int = 1200, poll_interval: float = 5.0,
+                 store: SharedStore | None = None):
         self.db = db
         self.ttl = ttl
-        self._cache = None
-        self._cache_ts = 0
-
-    async def fetch_schema(self) -> str:
-        query = text("""
-            SELECT table_name, column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = :schema
-            ORDER BY table_name, ordinal_position
-        """)
+        self.top_k = top_k
+        self.token_budget = token_budget
+        if store:
+            # Only the leader worker queries the catalog; the others read its snapshot.
+            source = SharedSchemaSource(store, self.fetch_schema, self.fetch_catalog_version)
+            self.cache = SchemaCache(source.load, source.probe_version, poll_interval, ttl)
+        else:
+            self.cache = SchemaCache(self.fetch_schema, self.fetch_catalog_version, poll_interval, ttl)
+
+    @OperationTimer("schema_fetch")
+    async def fetch_schema(self) -> SchemaIndex:
+        """
+        Columns, keys, indexes and row estimates for the schema in one round trip.
+        """
+        async with self.db.get_conn() as conn:
+            catalog = await conn.fetchval(CATALOG_QUERY.format(schema="$1"), self.db.schema)
+        return SchemaIndex(parse_catalog(catalog))
+
+    async def fetch_catalog_version(self) -> str:
         async with self.db.get_conn() as conn:
-            result = await conn.execute(query, {"schema": self.db.schema})
-            rows = result.fetchall()
+            return await conn.fetchval(CATALOG_VERSION_QUERY.format(schema="$1"), self.db.schema)
 
-        grouped = defaultdict(list)
-        for table, column, dtype in rows:
-            grouped[table].append(f"  {column}: {dtype}")
-        return "\n".join(f"{table}:\n" + "\n".join(cols) for table, cols in grouped.items())
+    async def fetch_table_counters(self) -> dict[str, str]:
+        """
+        Version per table (write counts and file node), used to invalidate cached results.
+        """
+        async with self.db.get_conn() as conn:
+            rows = await conn.fetch(TABLE_COUNTERS_QUERY.format(schema="$1"), self.db.schema)
+        return {table: count for table, count in rows}
 
     async def get_schema(self) -> str:
-        now = time.time()
-        if not self._cache or (now - self._cache_ts) > self.ttl:
-            self._cache = await self.fetch_schema()
-            self._cache_ts = now
-        return self._cache
\ No newline at end of file
+        return (await self.cache.get()).text
+
+    async def get_catalog(self) -> dict:
+        """
+        Structured schema: table -> columns, keys, indexes and row estimate.
+        """
+        return (await self.cache.get()).index.catalog
+
+    async def get_row_estimates(self) -> dict[str, int]:
+        return (await self.cache.get()).index.row_estimates
+
+    async def get_fingerprint(self) -> str:
+        """
+        Hash of the catalog's structure (tables, columns, keys, indexes),
+        without row estimates; unchanged by writes and ANALYZE.
+        """
+        return (await self.cache.get()).fingerprint
+
+    async def get_relevant_schema(self, question: str, top_k: int | None = None, token_budget: int | None = None) -> str:
+        """
+        Schema text pruned to the tables relevant to `question`.
+        """
+        snapshot = await self.cache.get()
+        return snapshot.index.select(question, top_k or self.top_k, token_budget or self.token_budget)
@@ -0,0 +1,40 @@
+import logging
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pool_limits(engine: AsyncEngine, max_inactive: float = 0, max_queries: int = 0) -> None:
+    """
+    asyncpg pool's max_inactive_connection_lifetime and max_queries for a
+    SQLAlchemy engine, whose pool has neither (pool_recycle is a maximum
+    age, not an idle timeout). A connection idle for more than
+    `max_inactive` seconds or that has run `max_queries` statements is
+    closed and replaced when it is next checked out; 0 disables a limit.
+    """
+    pool_engine = engine.sync_engine
+
+    @event.listens_for(pool_engine, "checkin")
+    def mark_idle(dbapi_connection, connection_record):
+        connection_record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(pool_engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info["queries"] = conn.info.get("queries", 0) + 1
+
+    @event.listens_for(pool_engine, "checkout")
+    def retire(dbapi_connection, connection_record, connection_proxy):
+        info = connection_record.info
+        idle_since = info.pop("idle_since", None)
+        if max_inactive and idle_since is not None and time.monotonic() - idle_since > max_inactive:
+            reason = f"idle for more than {max_inactive:g}s"
+        elif max_queries and info.get("queries", 0) >= max_queries:
+            reason = f"ran {info['queries']} queries"
+        else:
+            return
+        logger.debug(f"Replacing pooled connection: {reason}")
+        # The pool closes this connection and checks out a new one.
+        raise DisconnectionError(reason)
@@ -1,29 +1,75 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import json
+import socket
+from contextlib import asynccontextmanager
+import uvicorn
+from mcp.server.fastmcp import Context, FastMCP
 from pydantic import Field
 from typing import Annotated
-from db.connector import Database
 from services.database_config import Config
+from services.database_handler import Database
 from services.database_schema_service import DatabaseSchemaService
+from services.query_exporter import ExportFormat, QueryExporter
+from services.query_guard import QueryGuard
+from services.result_cache import ResultCache
+from services.result_encoding import Compression, ResultFormat, to_json
+from services.result_pager import ResultPager
+from services.shared_state import SharedStore, shared_loader
 from services.sql_query_service import QueryService
+from services.statement_cache import StatementCache
+from src.metrics import REGISTRY
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 
 class PostgresMcpServer:
     def __init__(self, config: Config):
-        self.app = FastAPI(lifespan=self.lifespan)
-        self.app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-
+        self.config = config
         self.db = Database(config)
-        self.schema_service = DatabaseSchemaService(self.db, config.schema_cache_ttl)
-        self.query_service = QueryService(self.db)
+        self.store = SharedStore(config.shared_dir) if config.workers > 1 else None
+        self.schema_service = DatabaseSchemaService(
+            self.db, config.schema_cache_ttl, config.schema_top_k, config.schema_token_budget,
+            config.schema_poll_interval, self.store
+        )
+        self.pager = ResultPager(config.page_size, config.cursor_idle_timeout, config.max_open_cursors)
+        self.guard = QueryGuard(
+            enabled=config.guard_enabled,
+            max_cost=config.guard_max_cost,
+            max_rows=config.guard_max_rows,
+            max_seq_scan_rows=config.guard_max_seq_scan_rows,
+            default_limit=config.guard_default_limit,
+            statement_timeout_ms=config.statement_timeout_ms,
+        )
+        self.statements = StatementCache(config.statement_cache_size)
+        self.result_cache = ResultCache(
+            shared_loader(self.store, "table_counters", self.schema_service.fetch_table_counters)
+            if self.store else self.schema_service.fetch_table_counters,
+            config.result_cache_max_bytes,
+            config.result_cache_ttl,
+            config.result_cache_poll_interval,
+            self.store,
+        ) if config.result_cache_enabled else None
+        self.exporter = QueryExporter(
+            config.export_directory, config.export_statement_timeout_ms, config.export_retention
+        )
+        self.query_service = QueryService(
+            self.db, self.pager, self.guard, self.schema_service, self.statements, self.result_cache,
+            self.exporter, config.result_formats
+        )
 
         self.mcp = FastMCP(
             name="Postgres MCP Server",
-            app=self.app,
             instructions="""
                 This server provides data analysis tools.
-                Use get_schema() to inspect tables.
-                Use execute_query(sql) to run queries.
+                Use get_schema() to inspect tables, or get_relevant_schema(question)
+                for only the tables relevant to a question.
+                Use execute_query(sql) to run queries, or execute_queries(statements)
+                to run several independent ones concurrently. SELECT results are paged;
+                pass the returned next_token to fetch_next_page(token) for more rows.
+                truncated is true when the result stopped at a LIMIT the server added;
+                add your own LIMIT or filter to control what is returned.
+                For large extracts use export_query(sql) to write a CSV file instead.
             """,
             transport="http",
             host=config.host,
@@ -33,21 +79,168 @@ class PostgresMcpServer:
         )
 
         self.register_tools()
+        self.register_http_routes()
 
     def register_tools(self):
         @self.mcp.resource("schema://analysis")
         async def get_schema():
             return await self.schema_service.get_schema()
 
+        @self.mcp.resource("schema://catalog", mime_type="application/json")
+        async def get_schema_catalog():
+            return json.dumps(await self.schema_service.get_catalog())
+
+        @self.mcp.resource("schema://fingerprint")
+        async def get_schema_fingerprint():
+            return await self.schema_service.get_fingerprint()
+
+        @self.mcp.resource("stats://pool", mime_type="application/json")
+        async def get_pool_stats():
+            return json.dumps(self.db.stats())
+
+        @self.mcp.resource("stats://statements", mime_type="application/json")
+        async def get_statement_stats():
+            return json.dumps(self.statements.stats())
+
+        @self.mcp.resource("stats://result-cache", mime_type="application/json")
+        async def get_result_cache_stats():
+            return json.dumps(self.result_cache.stats() if self.result_cache else {})
+
+        @self.mcp.tool()
+        async def get_relevant_schema(
+            question: Annotated[str, Field(description="Natural language question the SQL should answer")],
+            top_k: Annotated[int | None, Field(description="Most relevant tables to include before FK neighbours", gt=0)] = None,
+            token_budget: Annotated[int | None, Field(description="Approximate token budget for the schema text", gt=0)] = None,
+        ) -> str:
+            return await self.schema_service.get_relevant_schema(question, top_k, token_budget)
+
         @self.mcp.tool()
         async def execute_query(
             sql: Annotated[str, Field(description="SQL SELECT statement")],
+            page_size: Annotated[int | None, Field(description="Rows per page (defaults to server setting)", gt=0)] = None,
+            use_cache: Annotated[bool, Field(description="Serve an identical recent result from the result cache if enabled")] = True,
+            format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+            compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
+        ):
+            return to_json(await self.query_service.execute(sql, page_size, use_cache, format, compression))
+
+        @self.mcp.tool()
+        async def execute_queries(
+            statements: Annotated[list[str], Field(description="Independent SQL statements to run concurrently", min_length=1)],
+            max_parallel: Annotated[int | None, Field(description="Statements run at once (capped by the server setting)", gt=0)] = None,
+            timeout: Annotated[float | None, Field(description="Seconds each statement may take (defaults to server setting)", gt=0)] = None,
+            page_size: Annotated[int | None, Field(description="Rows per page (defaults to server setting)", gt=0)] = None,
+            format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+            compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
+        ):
+            return to_json(await self.query_service.execute_many(
+                statements,
+                min(max_parallel or self.config.batch_max_parallel, self.config.batch_max_parallel),
+                timeout or self.config.batch_statement_timeout,
+                page_size, format, compression,
+            ))
+
+        @self.mcp.tool()
+        async def export_query(
+            sql: Annotated[str, Field(description="SQL SELECT statement to export")],
+            ctx: Context,
+            format: Annotated[ExportFormat, Field(description="csv (with header) or binary (PostgreSQL COPY binary)")] = "csv",
+            path: Annotated[str | None, Field(description="File path relative to the server's export directory; generated if omitted")] = None,
+        ):
+            async def progress(written: int, chunks: int) -> None:
+                await ctx.report_progress(progress=written, total=None)
+
+            result = await self.query_service.export(sql, format, path, progress)
+            if isinstance(result, dict) and self.exporter.download_path(result["name"]):
+                result["download"] = f"/exports/{result['name']}"
+            return result
+
+        @self.mcp.tool()
+        async def fetch_next_page(
+            token: Annotated[str, Field(description="next_token returned by execute_query or a previous page")],
+            format: Annotated[ResultFormat, Field(description="rows: value lists per row; columnar: one array per column; arrow: Arrow IPC (base64), if enabled on the server")] = "rows",
+            compression: Annotated[Compression, Field(description="gzip the payload (returned base64 encoded)")] = "none",
         ):
-            return await self.query_service.execute(sql)
+            return to_json(await self.query_service.next_page(token, format, compression))
+
+    def register_http_routes(self):
+        REGISTRY.register_stats("db_pool", self.db.stats)
+        REGISTRY.register_stats("statements", self.statements.stats)
+        if self.result_cache:
+            REGISTRY.register_stats("result_cache", self.result_cache.stats)
+
+        @self.mcp.custom_route("/healthz", methods=["GET"])
+        async def healthz(request: Request) -> JSONResponse:
+            return JSONResponse({"status": "ok"})
 
-    async def lifespan(self, app: FastAPI):
-        yield
-        await self.db.dispose()
+        @self.mcp.custom_route("/readyz", methods=["GET"])
+        async def readyz(request: Request) -> JSONResponse:
+            if not self.db.pool:
+                return JSONResponse({"ready": False, "error": "Database pool is not connected."}, status_code=503)
+            try:
+                snapshot = await asyncio.wait_for(self.schema_service.cache.get(), timeout=5)
+            except Exception as e:
+                return JSONResponse({"ready": False, "error": f"{type(e).__name__}: {e}"}, status_code=503)
+            return JSONResponse({"ready": True, "schema_version": snapshot.version, "pool": self.db.stats()})
+
+        @self.mcp.custom_route("/exports/{name}", methods=["GET"])
+        async def download_export(request: Request) -> Response:
+            path = self.exporter.download_path(request.path_params["name"])
+            if path is None:
+                return JSONResponse({"error": "Unknown export."}, status_code=404)
+            # Sent in fixed-size chunks straight from the file.
+            return FileResponse(path, filename=request.path_params["name"])
+
+        @self.mcp.custom_route("/metrics", methods=["GET"])
+        async def metrics(request: Request) -> PlainTextResponse:
+            return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    @asynccontextmanager
+    async def lifespan(self):
+        await self.db.connect()
+        # Load the schema before serving so no MCP read waits on the catalog.
+        await self.schema_service.cache.refresh()
+        try:
+            yield
+        finally:
+            if self.result_cache:
+                await self.result_cache.stop()
+            await self.schema_service.cache.stop()
+            await self.pager.close_all()
+            await self.db.dispose()
+            if self.store:
+                self.store.close()
+
+    def http_app(self) -> Starlette:
+        """
+        The streamable HTTP app FastMCP serves, with CORS and this server's
+        lifespan around the MCP session manager's. FastMCP's own `lifespan`
+        hook runs once per MCP session, so the pool cannot live there.
+        """
+        app = self.mcp.streamable_http_app()
+        app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+        session_lifespan = app.router.lifespan_context
+
+        @asynccontextmanager
+        async def lifespan(app: Starlette):
+            async with self.lifespan(), session_lifespan(app):
+                yield
+
+        app.router.lifespan_context = lifespan
+        return app
 
     async def run(self):
-        await self.mcp.run_streamable_http_async()
\ No newline at end of file
+        # lifespan="on": a database that cannot be reached stops the server instead of being logged and ignored.
+        config = uvicorn.Config(
+            self.http_app(), host=self.config.host, port=self.config.port,
+            log_level=self.config.log_level.lower(), lifespan="on",
+        )
+        await uvicorn.Server(config).serve()
+
+    async def serve_worker(self, sock: socket.socket):
+        """
+        One process of a multi-worker deployment, serving on a shared socket.
+        Each worker opens its own pool and loads (or reads) its own schema snapshot.
+        """
+        config = uvicorn.Config(self.http_app(), log_level=self.config.log_level.lower(), lifespan="on")
+        await uvicorn.Server(config).serve(sockets=[sock])
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import re
+import secrets
+import time
+from typing import Awaitable, Callable, Literal, Optional
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+ExportFormat = Literal["csv", "binary"]
+
+_EXTENSIONS = {"csv": ".csv", "binary": ".pgcopy"}
+_COPY_ROWS = re.compile(r"COPY (\d+)")
+
+# Progress is reported at most this often.
+_PROGRESS_BYTES = 8 << 20
+_PROGRESS_SECONDS = 1.0
+
+
+class QueryExporter:
+    """
+    Bulk export of a SELECT with COPY (...) TO STDOUT.
+    asyncpg hands over the COPY stream chunk by chunk and each chunk is
+    appended to a file under `directory`, so memory use does not grow with
+    the result. Exports without an explicit path get a generated name and
+    can be downloaded from the server's /exports route; those older than
+    `retention` seconds are removed when the next export starts.
+    """
+
+    def __init__(self, directory: str, statement_timeout_ms: int = 0, retention: float = 86400.0):
+        self.directory = os.path.realpath(directory)
+        self.statement_timeout_ms = statement_timeout_ms
+        self.retention = retention
+
+    def resolve(self, path: Optional[str], format: ExportFormat) -> str:
+        """
+        Absolute target path; relative paths are taken inside `directory`
+        and nothing may escape it.
+        """
+        name = path or f"export-{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}{_EXTENSIONS[format]}"
+        target = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.commonpath([self.directory, target]) != self.directory or target == self.directory:
+            raise ValueError(f"Export path must be a file inside {self.directory}.")
+        return target
+
+    def download_path(self, name: str) -> Optional[str]:
+        if os.path.basename(name) != name or not name.endswith(tuple(_EXTENSIONS.values())):
+            return None
+        # Resolved, so a symlink inside the directory cannot point elsewhere.
+        target = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.dirname(target) != self.directory:
+            return None
+        return target if os.path.isfile(target) else None
+
+    async def export(self, conn: asyncpg.Connection, sql: str, format: ExportFormat = "csv",
+                     path: Optional[str] = None,
+                     progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> dict:
+        """
+        Runs the export on `conn` in a read-only transaction and returns
+        {path, name, format, rows, bytes, seconds}. `progress(bytes, chunks)`
+        is awaited periodically while data arrives.
+        """
+        sql = sql.strip().rstrip(";").rstrip()
+        if not sql.lower().startswith(("select", "with")):
+            raise ValueError("Only SELECT statements can be exported.")
+
+        target = self.resolve(path, format)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if path is None:
+            await asyncio.to_thread(self._remove_expired)
+
+        written, chunks = 0, 0
+        reported_bytes, reported_at = 0, time.monotonic()
+        started = time.perf_counter()
+        partial_path = f"{target}.part"
+        f = await asyncio.to_thread(open, partial_path, "wb")
+        try:
+            async def write(chunk: bytes) -> None:
+                nonlocal written, chunks, reported_bytes, reported_at
+                await asyncio.to_thread(f.write, chunk)
+                written += len(chunk)
+                chunks += 1
+                if progress and (written - reported_bytes >= _PROGRESS_BYTES
+                                 or time.monotonic() - reported_at >= _PROGRESS_SECONDS):
+                    reported_bytes, reported_at = written, time.monotonic()
+                    await progress(written, chunks)
+
+            async with conn.transaction(readonly=True):
+                if self.statement_timeout_ms > 0:
+                    await conn.execute(f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}")
+                status = await conn.copy_from_query(sql, output=write, format=format,
+                                                     header=True if format == "csv" else None)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(self._remove, partial_path)
+            raise
+        await asyncio.to_thread(f.close)
+        os.replace(partial_path, target)
+
+        match = _COPY_ROWS.search(status or "")
+        result = {
+            "path": target,
+            "name": os.path.relpath(target, self.directory),
+            "format": format,
+            "rows": int(match.group(1)) if match else None,
+            "bytes": written,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if progress:
+            await progress(written, chunks)
+        logger.info(f"Exported {result['rows']} rows ({written} bytes) to {target} in {result['seconds']}s")
+        return result
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_expired(self) -> None:
+        cutoff = time.time() - self.retention
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if (entry.name.startswith("export-") and entry.is_file()
+                        and entry.stat().st_mtime < cutoff):
+                    self._remove(entry.path)
@@ -0,0 +1,139 @@
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# String literals, quoted identifiers and comments, which may contain "limit" or parentheses.
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LIMIT_TOKEN = re.compile(r"[()]|\blimit\s+(?:\d+\b|all\b|\$\d+)|\bfetch\s+(?:first|next)\b", re.IGNORECASE)
+
+
+class QueryRejectedError(ValueError):
+    """Raised when a statement's estimated plan exceeds the configured limits."""
+
+
+class QueryGuard:
+    """
+    Pre-execution check for generated SELECTs.
+    Adds a LIMIT when the statement has none (one row over `default_limit`,
+    so callers can tell whether the result was cut short), runs EXPLAIN
+    (FORMAT JSON) and
+    rejects plans whose estimated cost or row count is over the limits, or
+    that sequentially scan a table larger than `max_seq_scan_rows`.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(self, enabled: bool = True, max_cost: float = 0, max_rows: int = 0, max_seq_scan_rows: int = 0,
+                 default_limit: int = 0, statement_timeout_ms: int = 0):
+        self.enabled = enabled
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.max_seq_scan_rows = max_seq_scan_rows
+        self.default_limit = default_limit
+        self.statement_timeout_ms = statement_timeout_ms
+
+    @property
+    def timeout_statement(self) -> Optional[str]:
+        """
+        SET LOCAL applying the per-statement timeout to the current transaction.
+        """
+        if self.statement_timeout_ms <= 0:
+            return None
+        return f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}"
+
+    @staticmethod
+    def has_limit(sql: str) -> bool:
+        """
+        Whether the top-level statement has a LIMIT or FETCH FIRST/NEXT; one
+        inside a subquery, a literal or a comment does not bound the result.
+        """
+        depth = 0
+        for match in _LIMIT_TOKEN.finditer(_LITERAL.sub(" ", sql)):
+            token = match.group()
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+            elif depth == 0:
+                return True
+        return False
+
+    def apply_limit(self, sql: str) -> tuple[str, Optional[int]]:
+        """
+        The statement with LIMIT default_limit + 1 appended if it has no LIMIT
+        of its own, and the number of rows to return (None if no limit was
+        added). Callers drop the extra row and report the result truncated
+        when it exists.
+        """
+        sql = sql.strip().rstrip(";").rstrip()
+        if self.default_limit <= 0 or self.has_limit(sql):
+            return sql, None
+        return f"{sql}\nLIMIT {int(self.default_limit) + 1}", int(self.default_limit)
+
+    def rewrite(self, sql: str) -> tuple[str, Optional[int]]:
+        """
+        The statement as it will run: with a LIMIT added when the guard is on.
+        """
+        return self.apply_limit(sql) if self.enabled else (sql, None)
+
+    async def review(self, sql: str, explain: Callable[[str], Awaitable[Any]],
+                     table_rows: Optional[dict[str, int]] = None) -> tuple[str, dict]:
+        """
+        Returns the (possibly rewritten) SQL to run and its plan summary.
+        `explain` runs a statement on the caller's connection and returns the
+        EXPLAIN output; `sql` may use $n placeholders if `explain` binds
+        them. `table_rows` maps table names to row estimates.
+        """
+        if not self.enabled:
+            return sql, {}
+
+        sql, _ = self.rewrite(sql)
+        plan = await explain(f"EXPLAIN (FORMAT JSON) {sql}")
+        summary = self.summarize(plan, table_rows or {})
+        self.check(summary)
+        logger.info(f"Plan summary: {summary}")
+        return sql, summary
+
+    @staticmethod
+    def summarize(plan: Any, table_rows: dict[str, int]) -> dict:
+        if isinstance(plan, (str, bytes)):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+
+        seq_scans = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") == "Seq Scan":
+                relation = node.get("Relation Name", "")
+                seq_scans.append({
+                    "relation": relation,
+                    "table_rows": table_rows.get(relation, int(node.get("Plan Rows", 0))),
+                })
+            stack.extend(node.get("Plans", ()))
+
+        return {
+            "node": root.get("Node Type"),
+            "total_cost": root.get("Total Cost", 0.0),
+            "rows": root.get("Plan Rows", 0),
+            "seq_scans": seq_scans,
+        }
+
+    def check(self, summary: dict) -> None:
+        if self.max_cost and summary["total_cost"] > self.max_cost:
+            raise QueryRejectedError(
+                f"Estimated cost {summary['total_cost']:.0f} exceeds the limit of {self.max_cost:.0f}."
+            )
+        if self.max_rows and summary["rows"] > self.max_rows:
+            raise QueryRejectedError(
+                f"Estimated {summary['rows']} rows exceeds the limit of {self.max_rows}."
+            )
+        if self.max_seq_scan_rows:
+            for scan in summary["seq_scans"]:
+                if scan["table_rows"] > self.max_seq_scan_rows:
+                    raise QueryRejectedError(
+                        f"Sequential scan of {scan['relation']} (~{scan['table_rows']} rows) "
+                        f"exceeds the limit of {self.max_seq_scan_rows} rows."
+                    )
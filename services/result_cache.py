@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    from services.shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'"((?:[^"]|"")+)"|([A-Za-z_][\w$]*)|(\d[\w.]*)|(\S)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# Words that may precede "(" without being a call whose result can differ
+# between two runs over unchanged tables: syntax, aggregates, window
+# functions and built-ins that depend only on their arguments.
+_DETERMINISTIC_CALLS = frozenset("""
+    select from join where on using and or not in exists any all some as values over filter group
+    by within having order partition limit offset with asc desc row array cast lateral distinct between like ilike similar is then else when case
+    count sum avg min max bool_and bool_or every array_agg string_agg json_agg jsonb_agg
+    json_object_agg jsonb_object_agg stddev stddev_pop stddev_samp variance var_pop var_samp
+    percentile_cont percentile_disc mode corr covar_pop covar_samp bit_and bit_or
+    row_number rank dense_rank percent_rank cume_dist ntile lag lead first_value last_value nth_value
+    coalesce nullif greatest least extract date_part date_trunc make_date make_time make_interval
+    lower upper initcap length char_length octet_length substring substr trim btrim ltrim rtrim
+    replace concat concat_ws left right lpad rpad position strpos split_part reverse repeat format
+    regexp_replace regexp_match regexp_matches to_char to_number to_date
+    abs ceil ceiling floor round trunc mod power sqrt exp ln log sign div width_bucket
+    array_length cardinality unnest array_position array_to_string string_to_array generate_series
+    json_build_object jsonb_build_object json_build_array jsonb_build_array to_json to_jsonb
+    row_to_json json_extract_path_text jsonb_extract_path_text jsonb_array_length md5
+    numeric decimal varchar char character timestamp time interval bit float
+""".split())
+
+# Special values written without parentheses that change between statements.
+_VOLATILE_WORDS = frozenset({
+    "current_date", "current_time", "current_timestamp", "localtime", "localtimestamp",
+    "current_user", "session_user", "current_role",
+})
+
+# Words that end a FROM list.
+_FROM_END = frozenset({
+    "where", "group", "having", "window", "order", "limit", "offset", "fetch", "for",
+    "union", "intersect", "except", "select",
+})
+
+# Functions whose argument syntax uses FROM.
+_FROM_SYNTAX_CALLS = frozenset({"extract", "substring", "trim", "overlay", "position"})
+
+# Input strings for date/time types that name a moment relative to the
+# present, e.g. 'now'::timestamptz or date 'today'.
+_TIME_LITERALS = frozenset({"now", "today", "tomorrow", "yesterday"})
+
+# Version per table: its modification counter, which only grows, and its
+# file node, which TRUNCATE replaces without touching the counters.
+TABLE_COUNTERS_QUERY = """
+    SELECT relname, (n_tup_ins + n_tup_upd + n_tup_del) || ':' || pg_relation_filenode(relid)
+    FROM pg_stat_user_tables
+    WHERE schemaname = {schema}
+"""
+
+
+class _Entry:
+    def __init__(self, value: dict, size: int, versions: dict[str, Optional[str]], expires_at: float):
+        self.value = value
+        self.size = size
+        self.versions = versions
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """
+    Byte-bounded LRU of complete SELECT results.
+    Each entry records the version (write counter and file node) of every
+    table it read, as of before the query ran. A background poll of
+    pg_stat_user_tables drops entries whose tables have changed since. Entries also expire after `ttl` seconds. Only
+    statements over plain tables of the catalog are cached: views and
+    partitioned parents have no counters of their own.
+    With a `store`, entries are also written to the workers' shared store
+    and a local miss is served from there if its tables are unchanged.
+    """
+
+    def __init__(self, load_counters: Callable[[], Awaitable[dict[str, str]]], max_bytes: int = 64 << 20,
+                 ttl: float = 60.0, poll_interval: float = 2.0, store: Optional["SharedStore"] = None):
+        self._load_counters = load_counters
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.store = store
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._counters: dict[str, str] = {}
+        self._bytes = 0
+        self._poll_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(sql: str, schema: str) -> str:
+        normalized = " ".join(sql.strip().rstrip(";").split())
+        return hashlib.sha256(f"{schema}\0{normalized}".encode()).hexdigest()
+
+    @staticmethod
+    def referenced_tables(sql: str, catalog: dict[str, dict], schema: Optional[str] = None) -> Optional[set[str]]:
+        """
+        Catalog tables read by `sql`, or None when its result cannot be
+        tracked: it reads a view, a partitioned parent (its counters stay at
+        zero, writes land on the partitions) or a relation outside the
+        catalog, or it calls a function that may return something else on
+        the next run (now(), random(), nextval(), user-defined functions, or
+        a literal such as 'now' or 'today' cast to a date/time type).
+        Only relations qualified with `schema`, if given, count as catalog
+        relations.
+        """
+        if any(literal[1:-1].strip().lower() in _TIME_LITERALS for literal in _STRING.findall(sql)):
+            return None
+
+        tokens = []
+        for quoted, word, number, symbol in _TOKEN.findall(_COMMENT.sub(" ", _STRING.sub("''", sql))):
+            if quoted:
+                tokens.append(("name", quoted.replace('""', '"')))
+            elif word:
+                tokens.append(("word", word.lower()))
+            else:
+                tokens.append(("symbol", number or symbol))
+
+        def at(i: int) -> str:
+            return tokens[i][1] if 0 <= i < len(tokens) else ""
+
+        # WITH names: `name AS (`, `name AS [NOT] MATERIALIZED (` or `name (columns) AS (`.
+        ctes = set()
+        for i, (kind, value) in enumerate(tokens):
+            if kind == "symbol":
+                continue
+            j = i + 1
+            if at(j) == "(":
+                while j < len(tokens) and at(j) != ")":
+                    j += 1
+                j += 1
+            if at(j) == "as" and at(j + 1) in ("(", "materialized", "not"):
+                ctes.add(value)
+
+        tables = set()
+        # One frame per open parenthesis: [inside a FROM list, parenthesis belongs to a FROM-syntax call].
+        frames = [[False, False]]
+        expect_relation = False
+        for i, (kind, value) in enumerate(tokens):
+            frame = frames[-1]
+            if value == "(" and kind == "symbol":
+                # `FROM (a JOIN b ...)` continues the FROM list; `FROM (SELECT ...)` ends it at SELECT.
+                frames.append([expect_relation, at(i - 1) in _FROM_SYNTAX_CALLS])
+                continue
+            if value == ")" and kind == "symbol":
+                if len(frames) > 1:
+                    frames.pop()
+                continue
+            if kind == "word" and value in _VOLATILE_WORDS:
+                return None
+            if kind != "symbol" and at(i + 1) == "(" and value not in ctes:
+                # A cast's type modifier, e.g. ::numeric(10, 2), is not a call.
+                if kind == "name" or (value not in _DETERMINISTIC_CALLS and at(i - 1) != ":"):
+                    return None
+            if kind == "word" and value in ("from", "join"):
+                if value == "from" and (frame[1] or at(i - 1) == "distinct"):
+                    continue
+                frame[0], expect_relation = True, True
+                continue
+            if not frame[0]:
+                continue
+            if kind == "word" and value in _FROM_END:
+                frame[0], expect_relation = False, False
+            elif value == "," and kind == "symbol":
+                expect_relation = True
+            elif expect_relation and kind != "symbol" and value not in ("only", "lateral"):
+                expect_relation = False
+                if at(i + 1) == "(":
+                    continue  # A set-returning function, checked as a call above.
+                name, qualifier = value, None
+                if at(i + 1) == "." and i + 2 < len(tokens):
+                    qualifier, name = value, at(i + 2)
+                if qualifier is None and name in ctes:
+                    continue
+                if name not in catalog or (qualifier is not None and qualifier != schema):
+                    return None
+                tables.add(name)
+
+        if not tables or any(catalog[table].get("kind") != "r" for table in tables):
+            return None
+        return tables
+
+    def get(self, key: str) -> Optional[dict]:
+        self._ensure_polling()
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            value = self._get_shared(key)
+            if value is not None:
+                self.shared_hits += 1
+                return value
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def versions(self, tables: set[str]) -> dict[str, Optional[str]]:
+        """
+        The tables' current versions. Callers take them before running the
+        query, so a write committed while it runs leaves the entry stale.
+        """
+        return {table: self._counters.get(table) for table in tables}
+
+    def put(self, key: str, value: dict, versions: dict[str, Optional[str]]) -> None:
+        if any(self._counters.get(table) != version for table, version in versions.items()):
+            return  # A table changed while the query ran.
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        self._put_local(key, value, size, versions, self.ttl)
+        if self.store:
+            self.store.cache.set(f"result:{key}", (value, size, versions, time.time() + self.ttl), expire=self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+    async def stop(self) -> None:
+        if self._poll_task and not self._poll_task.done():
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+
+    def _put_local(self, key: str, value: dict, size: int, versions: dict[str, Optional[str]], ttl: float) -> None:
+        self._drop(key)
+        self._entries[key] = _Entry(value, size, versions, time.monotonic() + ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _get_shared(self, key: str) -> Optional[dict]:
+        """
+        An entry another worker cached, if none of its tables changed since.
+        """
+        if not self.store:
+            return None
+        record = self.store.cache.get(f"result:{key}")
+        if record is None:
+            return None
+        value, size, versions, expires_at = record
+        ttl = expires_at - time.time()
+        if ttl <= 0 or any(self._counters.get(table) != version for table, version in versions.items()):
+            return None
+        self._put_local(key, value, size, versions, ttl)
+        return value
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _ensure_polling(self) -> None:
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll())
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                self._counters = await self._load_counters()
+                stale = [
+                    key for key, entry in self._entries.items()
+                    if any(self._counters.get(table) != version for table, version in entry.versions.items())
+                ]
+                for key in stale:
+                    self._drop(key)
+                self.invalidations += len(stale)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Without fresh counters nothing can be trusted.
+                logger.warning(f"Result cache invalidation poll failed, clearing cache: {e}")
+                self._entries.clear()
+                self._bytes = 0
+            await asyncio.sleep(self.poll_interval)
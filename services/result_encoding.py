@@ -0,0 +1,120 @@
+import base64
+import gzip
+import json
+from typing import Any, Iterable, Literal, get_args
+import pydantic_core
+from src.operation_timer import OperationTimer
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for the "arrow" format
+    pa = None
+
+ResultFormat = Literal["rows", "columnar", "arrow"]
+Compression = Literal["none", "gzip"]
+
+
+def enabled_formats(value: str) -> frozenset[str]:
+    """
+    Parses the comma separated [query] result_formats setting; "rows" is
+    always available. Unknown names and "arrow" without pyarrow installed
+    are rejected here so the server fails at startup, not on a request.
+    """
+    formats = {name.strip() for name in value.split(",") if name.strip()} | {"rows"}
+    unknown = formats - set(get_args(ResultFormat))
+    if unknown:
+        raise ValueError(f"[query] result_formats: unknown format(s) {', '.join(sorted(unknown))}.")
+    if "arrow" in formats and pa is None:
+        raise ValueError("[query] result_formats includes arrow, which needs pyarrow installed on the server.")
+    return frozenset(formats)
+
+
+def check_format(format: ResultFormat, enabled: Iterable[str]) -> None:
+    if format not in enabled:
+        raise ValueError(
+            f"The {format} format is not enabled on this server; use one of {', '.join(sorted(enabled))}."
+        )
+
+
+def column_types(columns: list[str], rows: list[list]) -> list[str]:
+    """
+    Python type name of each column's first non-null value ("null" if none).
+    """
+    types = []
+    for index in range(len(columns)):
+        value = next((row[index] for row in rows if row[index] is not None), None)
+        types.append("null" if value is None else type(value).__name__.lower())
+    return types
+
+
+def to_columnar(columns: list[str], rows: list[list]) -> dict:
+    return {
+        "columns": columns,
+        "types": column_types(columns, rows),
+        "data": [list(values) for values in zip(*rows)] if rows else [[] for _ in columns],
+        "row_count": len(rows),
+    }
+
+
+def to_arrow_ipc(columns: list[str], rows: list[list]) -> bytes:
+    if pa is None:
+        raise RuntimeError("The arrow format needs pyarrow installed on the server.")
+
+    arrays = []
+    for values in (zip(*rows) if rows else ([] for _ in columns)):
+        values = list(values)
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    table = pa.Table.from_arrays(arrays, names=columns)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@OperationTimer("serialization")
+def to_json(result: Any) -> Any:
+    """
+    A tool result as the JSON text FastMCP would otherwise produce from it
+    after the tool returns, so the cost shows up here. Error messages
+    (plain strings) pass through.
+    """
+    if isinstance(result, str):
+        return result
+    return pydantic_core.to_json(result, fallback=str).decode()
+
+
+@OperationTimer("encoding")
+def encode_page(page: dict, format: ResultFormat = "rows", compression: Compression = "none") -> dict:
+    """
+    Re-encodes a result page ({columns, rows, ...}) for the wire.
+
+    "rows" keeps column names once and one value list per row, "columnar"
+    sends one typed array per column and "arrow" an Arrow IPC stream.
+    Binary or compressed payloads are base64 encoded in `data` and
+    described by `encoding`, e.g. "columnar+json+gzip". Other page keys
+    (next_token, plan, cached) are passed through unchanged.
+    """
+    if format == "rows" and compression == "none":
+        return page
+
+    meta = {key: value for key, value in page.items() if key not in ("columns", "rows")}
+    columns, rows = page["columns"], page["rows"]
+
+    if format == "arrow":
+        payload, encoding = to_arrow_ipc(columns, rows), "arrow-ipc"
+    else:
+        body = {"columns": columns, "rows": rows} if format == "rows" else to_columnar(columns, rows)
+        if compression == "none":
+            return {**meta, **body, "format": format}
+        payload = json.dumps(body, default=str, separators=(",", ":")).encode()
+        encoding = f"{format}+json"
+
+    if compression == "gzip":
+        payload = gzip.compress(payload)
+        encoding += "+gzip"
+
+    return {**meta, "format": format, "encoding": encoding, "data": base64.b64encode(payload).decode("ascii")}
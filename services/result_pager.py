@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import secrets
+import time
+from typing import Any, Optional, Protocol, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class PageSource(Protocol):
+    """
+    An open server-side cursor that can hand out rows in chunks.
+    Implementations own the connection/transaction the cursor lives in.
+    `limit_applied` is the LIMIT the query guard appended, if any.
+    """
+    columns: list[str]
+    limit_applied: Optional[int]
+
+    async def fetch(self, n: int) -> Sequence[Sequence[Any]]: ...
+
+    async def close(self) -> None: ...
+
+
+class _OpenCursor:
+    def __init__(self, source: PageSource, page_size: int):
+        self.source = source
+        self.page_size = page_size
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.rows_sent = 0
+
+
+class ResultPager:
+    """
+    Keeps server-side cursors open between MCP calls so large results are
+    delivered page by page. Memory held per cursor is bounded by the page size.
+    Each open cursor holds a pool connection, so `max_open` must stay below
+    the pool size. Cursors idle for longer than `idle_timeout` seconds are
+    closed by a background sweep, whether or not another query arrives.
+    """
+
+    def __init__(self, page_size: int, idle_timeout: float, max_open: int):
+        self.page_size = page_size
+        self.idle_timeout = idle_timeout
+        self.max_open = max_open
+        # An idle cursor is closed at most idle_timeout + sweep_interval after its last page.
+        self.sweep_interval = max(1.0, idle_timeout / 2)
+        self._cursors: dict[str, _OpenCursor] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    async def open(self, source: PageSource, page_size: int | None = None) -> dict:
+        """
+        Registers a cursor and returns its first page.
+        """
+        self._ensure_sweeping()
+        try:
+            await self._close_idle()
+            if len(self._cursors) >= self.max_open:
+                raise RuntimeError(
+                    f"Too many open result cursors ({self.max_open}); "
+                    "fetch remaining pages or let them expire first."
+                )
+        except BaseException:
+            # Includes cancellation: nothing else holds the source's connection yet.
+            await source.close()
+            raise
+
+        token = secrets.token_urlsafe(16)
+        self._cursors[token] = _OpenCursor(source, page_size or self.page_size)
+        return await self.next_page(token)
+
+    async def next_page(self, token: str) -> dict:
+        """
+        Returns the next page for `token`. When the cursor is exhausted it is
+        closed and `next_token` is None. When the guard added a LIMIT the
+        source holds one row more than `limit_applied`; that row is never
+        sent, and `truncated` reports that it existed.
+        """
+        cursor = self._cursors.get(token)
+        if cursor is None:
+            raise KeyError(f"Unknown or expired continuation token: {token}")
+
+        async with cursor.lock:
+            cursor.last_used = time.monotonic()
+            limit = cursor.source.limit_applied
+            wanted = cursor.page_size
+            if limit is not None and limit - cursor.rows_sent <= wanted:
+                # The last page: also fetch the row past the limit, if any.
+                wanted = limit - cursor.rows_sent + 1
+            try:
+                rows = await cursor.source.fetch(wanted)
+            except BaseException:
+                await self.close(token)
+                raise
+
+            truncated = limit is not None and cursor.rows_sent + len(rows) > limit
+            if truncated:
+                rows = rows[:limit - cursor.rows_sent]
+            done = truncated or len(rows) < wanted
+            if done:
+                await self.close(token)
+
+            cursor.rows_sent += len(rows)
+            return {
+                "columns": cursor.source.columns,
+                "rows": [list(row) for row in rows],
+                "next_token": None if done else token,
+                "limit_applied": limit is not None,
+                "truncated": truncated,
+            }
+
+    async def close(self, token: str) -> None:
+        cursor = self._cursors.pop(token, None)
+        if cursor is None:
+            return
+        try:
+            await cursor.source.close()
+        except Exception:
+            logger.exception("Failed to close result cursor %s", token)
+
+    async def close_all(self) -> None:
+        if self._sweep_task and not self._sweep_task.done():
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+        for token in list(self._cursors):
+            await self.close(token)
+
+    def _ensure_sweeping(self) -> None:
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self._close_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Idle cursor sweep failed")
+
+    async def _close_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_timeout
+        for token, cursor in list(self._cursors.items()):
+            if cursor.last_used < cutoff and not cursor.lock.locked():
+                logger.debug("Closing idle result cursor %s", token)
+                await self.close(token)
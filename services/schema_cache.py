@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+from services.schema_index import SchemaIndex
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaSnapshot:
+    """
+    One loaded version of the schema: the index, its text rendering, a
+    fingerprint of its structure and the catalog version it was loaded at.
+    """
+    def __init__(self, index: SchemaIndex, version: str):
+        self.index = index
+        self.text = index.render()
+        self.fingerprint = index.fingerprint()
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+
+class SchemaCache:
+    """
+    Serves the last loaded schema without waiting on the catalog.
+    A background task polls a cheap catalog version probe and reloads only
+    when it changes (or the snapshot is older than `max_age`). Concurrent
+    reloads are collapsed into one, and callers keep getting the previous
+    snapshot while it runs. Only the very first read waits for a load.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[SchemaIndex]], probe_version: Callable[[], Awaitable[str]],
+                 poll_interval: float = 5.0, max_age: float = 300.0):
+        self._load = load
+        self._probe_version = probe_version
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    async def get(self) -> SchemaSnapshot:
+        self._ensure_polling()
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh()
+        if time.monotonic() - snapshot.loaded_at > self.max_age:
+            self._start_refresh()
+        return snapshot
+
+    async def refresh(self) -> SchemaSnapshot:
+        """
+        Reloads the schema, joining a reload that is already in flight.
+        """
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        """
+        Schedules a reload, e.g. from a DDL notification.
+        """
+        self._start_refresh()
+
+    async def stop(self) -> None:
+        for task in (self._poll_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._reload())
+            self._refresh_task.add_done_callback(self._log_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Schema reload failed: {task.exception()}")
+
+    async def _reload(self) -> SchemaSnapshot:
+        # Read the version first: a change racing the load is seen by the next poll.
+        version = await self._probe_version()
+        snapshot = SchemaSnapshot(await self._load(), version)
+        self._snapshot = snapshot
+        self.refreshes += 1
+        logger.info(f"Schema reloaded at catalog version {version[:12]}")
+        return snapshot
+
+    def _ensure_polling(self) -> None:
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll())
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                snapshot = self._snapshot
+                if snapshot is None or time.monotonic() - snapshot.loaded_at > self.max_age:
+                    await self.refresh()
+                elif await self._probe_version() != snapshot.version:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Schema refresh failed, serving previous snapshot: {e}")
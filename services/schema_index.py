@@ -0,0 +1,164 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Rough characters-per-token ratio for English text and identifiers.
+CHARS_PER_TOKEN = 4
+
+
+def _terms(text: str) -> list[str]:
+    """
+    Splits text or snake_case identifiers into lowercase terms with a crude
+    plural stem, so "tracks" matches "track" and "record_label" matches "labels".
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) > 3 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def _approximate(n: int) -> int:
+    """
+    Rounds a row estimate to one significant digit (1234 -> 1000), so the
+    rendered schema only changes when a table's size changes a lot.
+    """
+    if n < 10:
+        return n
+    magnitude = 10 ** (len(str(n)) - 1)
+    return round(n / magnitude) * magnitude
+
+
+class SchemaIndex:
+    """
+    Lexical index over tables and columns, built once per schema refresh.
+    `select` ranks tables against a question with BM25-style scoring, adds
+    their foreign-key neighbours so joins stay possible, and renders only
+    as many tables as fit in the token budget.
+
+    `catalog` is the structured form produced by the catalog introspection
+    query: table name -> columns, primary key, foreign keys, indexes and
+    row estimate. It is plain JSON so it can be cached or shipped as is.
+    """
+    TABLE_NAME_WEIGHT = 3.0
+
+    def __init__(self, catalog: dict[str, dict]):
+        self.catalog = catalog
+        self.row_estimates = {table: info.get("row_estimate") or 0 for table, info in catalog.items()}
+        self.foreign_keys: dict[str, set[str]] = defaultdict(set)
+        for table, info in catalog.items():
+            for fk in info.get("foreign_keys") or ():
+                self.foreign_keys[table].add(fk["references"])
+                self.foreign_keys[fk["references"]].add(table)
+
+        self._rendered = {table: self.render_table(table) for table in catalog}
+        self._term_weights: dict[str, Counter] = {}
+        document_frequency: Counter = Counter()
+
+        for table, info in catalog.items():
+            weights: Counter = Counter()
+            for term in _terms(table):
+                weights[term] += self.TABLE_NAME_WEIGHT
+            for column in info.get("columns") or ():
+                for term in _terms(column["name"]):
+                    weights[term] += 1.0
+            self._term_weights[table] = weights
+            document_frequency.update(weights.keys())
+
+        n = len(catalog)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def render_table(self, table: str) -> str:
+        """
+        Renders one table with its key columns and estimated size, e.g.
+
+            album (~1000 rows):
+              album_id: integer PK
+              label_id: integer FK -> record_label.label_id
+              indexes: album_title_idx(title)
+        """
+        info = self.catalog[table]
+        primary_key = set(info.get("primary_key") or ())
+        references = {}
+        for fk in info.get("foreign_keys") or ():
+            for column, ref_column in zip(fk["columns"], fk["ref_columns"]):
+                references[column] = f"{fk['references']}.{ref_column}"
+
+        lines = [f"{table} (~{_approximate(info.get('row_estimate') or 0)} rows):"]
+        for column in info.get("columns") or ():
+            line = f"  {column['name']}: {column['type']}"
+            if column["name"] in primary_key:
+                line += " PK"
+            if column["name"] in references:
+                line += f" FK -> {references[column['name']]}"
+            lines.append(line)
+
+        indexes = [
+            f"{index['name']}({', '.join(index['columns'] or ())})"
+            for index in info.get("indexes") or ()
+            if index["columns"] and set(index["columns"]) != primary_key
+        ]
+        if indexes:
+            lines.append(f"  indexes: {', '.join(indexes)}")
+        return "\n".join(lines)
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the catalog's structure. Row estimates are left out, so
+        writes and ANALYZE do not invalidate what is keyed by it.
+        """
+        structure = {
+            table: {key: value for key, value in info.items() if key != "row_estimate"}
+            for table, info in self.catalog.items()
+        }
+        return hashlib.sha256(json.dumps(structure, sort_keys=True).encode()).hexdigest()
+
+    def render(self, tables=None) -> str:
+        return "\n".join(self._rendered[table] for table in (self.catalog if tables is None else tables))
+
+    def rank(self, question: str) -> list[tuple[str, float]]:
+        terms = _terms(question)
+        scores = []
+        for table, weights in self._term_weights.items():
+            score = sum(
+                self._idf[term] * weights[term] / (weights[term] + 1.0)
+                for term in terms if term in weights
+            )
+            if score > 0:
+                scores.append((table, score))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def select(self, question: str, top_k: int, token_budget: int) -> str:
+        """
+        Renders the `top_k` most relevant tables plus their foreign-key
+        neighbours, most relevant first, within `token_budget` tokens.
+        Falls back to every table when nothing in the question matches.
+        """
+        ranked = [table for table, _ in self.rank(question)[:top_k]]
+        if not ranked:
+            ranked = list(self.catalog)
+
+        ordered = list(ranked)
+        for table in ranked:
+            for neighbour in sorted(self.foreign_keys.get(table, ())):
+                if neighbour not in ordered and neighbour in self.catalog:
+                    ordered.append(neighbour)
+
+        selected, used = [], 0
+        for table in ordered:
+            cost = math.ceil((len(self._rendered[table]) + 1) / CHARS_PER_TOKEN)
+            if selected and used + cost > token_budget:
+                continue
+            selected.append(table)
+            used += cost
+        return self.render(selected)
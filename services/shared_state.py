@@ -0,0 +1,116 @@
+import fcntl
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+import diskcache
+from services.schema_index import SchemaIndex
+
+logger = logging.getLogger(__name__)
+
+
+class SharedStore:
+    """
+    State shared by the worker processes of one server: a diskcache
+    directory and a leader lock file inside it.
+    Both are opened on first use so each forked worker gets its own
+    SQLite connection and its own lock file descriptor.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache: Optional[diskcache.Cache] = None
+        self._lock_fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def cache(self) -> diskcache.Cache:
+        self._check_fork()
+        if self._cache is None:
+            self._cache = diskcache.Cache(self.directory)
+        return self._cache
+
+    def is_leader(self) -> bool:
+        """
+        Whether this process holds the leader lock, taking it if it is free.
+        The kernel drops the lock when its holder exits, so another worker
+        takes over on its next call.
+        """
+        self._check_fork()
+        if self._lock_fd is None:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(os.path.join(self.directory, "leader.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._lock_fd = fd
+            logger.info(f"Worker {os.getpid()} is the leader for {self.directory}")
+        return True
+
+    def close(self) -> None:
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _check_fork(self) -> None:
+        # Handles opened before a fork belong to the parent; never reuse them.
+        if self._pid != os.getpid():
+            self._cache = None
+            self._lock_fd = None
+            self._pid = os.getpid()
+
+
+class SharedSchemaSource:
+    """
+    Load and version-probe functions for a SchemaCache shared by workers.
+    The leader queries the catalog and publishes each loaded catalog with
+    its version; the other workers probe and load the published copy, so
+    only one process polls Postgres. Until something is published,
+    followers fall back to querying the catalog themselves.
+    """
+
+    KEY = "schema"
+
+    def __init__(self, store: SharedStore, load: Callable[[], Awaitable[SchemaIndex]],
+                 probe_version: Callable[[], Awaitable[str]]):
+        self.store = store
+        self._load = load
+        self._probe_version = probe_version
+        self._version: Optional[str] = None
+
+    async def probe_version(self) -> str:
+        if self.store.is_leader():
+            self._version = await self._probe_version()
+            return self._version
+        published = self.store.cache.get(self.KEY)
+        return published[0] if published else await self._probe_version()
+
+    async def load(self) -> SchemaIndex:
+        if self.store.is_leader():
+            index = await self._load()
+            # Published together so no follower pairs a version with an older catalog.
+            self.store.cache.set(self.KEY, (self._version, index.catalog))
+            return index
+        published = self.store.cache.get(self.KEY)
+        if published is None:
+            return await self._load()
+        return SchemaIndex(published[1])
+
+
+def shared_loader(store: SharedStore, key: str, load: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+    """
+    Wraps a polled loader (e.g. table modification counters) so only the
+    leader runs it and the other workers read its last published result.
+    """
+    async def shared_load():
+        if store.is_leader():
+            value = await load()
+            store.cache.set(key, value)
+            return value
+        value = store.cache.get(key)
+        return value if value is not None else await load()
+    return shared_load
@@ -1,22 +1,143 @@
+import asyncpg
 
-from sqlalchemy import text
+from services.batch_executor import run_batch
+from services.database_handler import Database
+from services.database_schema_service import DatabaseSchemaService
+from services.query_exporter import ExportFormat, QueryExporter
+from services.query_guard import QueryGuard
+from services.result_cache import ResultCache
+from services.result_encoding import Compression, ResultFormat, check_format, encode_page
+from services.result_pager import ResultPager
+from services.statement_cache import StatementCache
+from src.operation_timer import OperationTimer
 
-from db.connector import Database
+
+class CursorResult:
+    """
+    asyncpg server-side cursor held open on its own connection and read-only
+    transaction until the ResultPager closes it.
+    """
+    def __init__(self, db: Database, conn: asyncpg.Connection, transaction, cursor, columns: list[str], plan: dict,
+                 limit_applied: int | None = None):
+        self.db = db
+        self.conn = conn
+        self.transaction = transaction
+        self.cursor = cursor
+        self.columns = columns
+        self.plan = plan
+        self.limit_applied = limit_applied
+
+    @classmethod
+    async def open(cls, db: Database, sql: str, guard: QueryGuard, statements: StatementCache,
+                   table_rows: dict[str, int] | None = None) -> "CursorResult":
+        sql, limit_applied = guard.rewrite(sql)
+        # A statement gone stale after DDL aborts the transaction; retry once in a new one.
+        for attempt in range(2):
+            conn = await db.acquire()
+            transaction = conn.transaction(readonly=True)
+            query = None
+            try:
+                query, args, columns = await statements.prepare(conn, sql)
+
+                async def explain(statement: str):
+                    # The parameterized text keeps one EXPLAIN per shape in asyncpg's statement cache.
+                    statements.track(conn, statement)
+                    return await conn.fetchval(statement, *args)
+
+                # Releasing the connection rolls back the transaction if it was started.
+                await transaction.start()
+                if guard.timeout_statement:
+                    await conn.execute(guard.timeout_statement)
+                _, plan = await guard.review(query, explain, table_rows)
+                cursor = await conn.cursor(query, *args)
+            except BaseException as e:
+                # Includes cancellation, e.g. a batch statement timing out.
+                await db.release(conn)
+                if query is not None and statements.invalidate(query, e) and not attempt:
+                    continue
+                raise
+            return cls(db, conn, transaction, cursor, columns, plan, limit_applied)
+
+    async def fetch(self, n: int):
+        return await self.cursor.fetch(n)
+
+    async def close(self) -> None:
+        try:
+            await self.transaction.rollback()
+        finally:
+            await self.db.release(self.conn)
 
 
 class QueryService:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, pager: ResultPager, guard: QueryGuard, schema_service: DatabaseSchemaService,
+                 statements: StatementCache, result_cache: ResultCache | None = None,
+                 exporter: QueryExporter | None = None, formats: frozenset[str] = frozenset({"rows", "columnar"})):
         self.db = db
+        self.pager = pager
+        self.guard = guard
+        self.schema_service = schema_service
+        self.statements = statements
+        self.result_cache = result_cache
+        self.exporter = exporter
+        self.formats = formats
 
-    async def execute(self, sql: str):
+    async def execute(self, sql: str, page_size: int | None = None, use_cache: bool = True,
+                      format: ResultFormat = "rows", compression: Compression = "none"):
         if not sql.lower().startswith(("select", "insert", "update", "delete")):
             return "Only SELECT, INSERT, UPDATE, DELETE statements are allowed."
 
         try:
+            check_format(format, self.formats)
+            if sql.lower().startswith("select"):
+                cache_key, versions = None, None
+                if self.result_cache and use_cache:
+                    tables = ResultCache.referenced_tables(sql, await self.schema_service.get_catalog(), self.db.schema)
+                    if tables:
+                        cache_key = ResultCache.key(sql, self.db.schema)
+                        cached = self.result_cache.get(cache_key)
+                        if cached is not None and len(cached["rows"]) <= (page_size or self.pager.page_size):
+                            return encode_page({**cached, "cached": True}, format, compression)
+                        versions = self.result_cache.versions(tables)
+
+                table_rows = await self.schema_service.get_row_estimates()
+                async with OperationTimer("sql_execution"):
+                    source = await CursorResult.open(self.db, sql, self.guard, self.statements, table_rows)
+                    page = await self.pager.open(source, page_size)
+                if source.plan:
+                    page["plan"] = source.plan
+                # Only complete results are cached; paged ones stay with their cursor.
+                if cache_key and page["next_token"] is None:
+                    self.result_cache.put(cache_key, page, versions)
+                return encode_page(page, format, compression)
+
             async with self.db.get_conn() as conn:
-                result = await conn.execute(text(sql))
-                if result.returns_rows:
-                    return result.fetchall()
+                await conn.execute(sql)
                 return "Query executed successfully."
         except Exception as e:
-            return f"Error: {type(e).__name__}: {e}"
\ No newline at end of file
+            return f"Error: {type(e).__name__}: {e}"
+
+    async def execute_many(self, statements: list[str], max_parallel: int, timeout: float,
+                           page_size: int | None = None, format: ResultFormat = "rows",
+                           compression: Compression = "none") -> list[dict]:
+        """
+        Runs independent statements concurrently on separate pool connections.
+        """
+        return await run_batch(
+            lambda sql: self.execute(sql, page_size, True, format, compression), statements, max_parallel, timeout
+        )
+
+    async def export(self, sql: str, format: ExportFormat = "csv", path: str | None = None, progress=None):
+        try:
+            async with self.db.get_conn() as conn:
+                return await self.exporter.export(conn, sql, format, path, progress)
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
+
+    async def next_page(self, token: str, format: ResultFormat = "rows", compression: Compression = "none"):
+        try:
+            check_format(format, self.formats)
+            async with OperationTimer("page_fetch"):
+                page = await self.pager.next_page(token)
+            return encode_page(page, format, compression)
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
@@ -0,0 +1,235 @@
+import datetime
+import logging
+import re
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Optional
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>--[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r"|(?P<ident>\"(?:[^\"]|\"\")*\")"
+    r"|(?P<number>(?<![\w.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.]))"
+    r"|(?P<word>\w+)"
+    r"|(?P<op><>|!=|<=|>=|::|\S)",
+    re.DOTALL,
+)
+
+# Literals after these tokens take their type from the other operand, so
+# they can become parameters without changing how the statement resolves.
+_COMPARISONS = {"=", "<>", "!=", "<", ">", "<=", ">=", "like", "ilike"}
+_ROW_COUNTS = {"limit", "offset"}
+
+_TEXT_TYPES = {"text", "varchar", "bpchar", "name", "citext", "char"}
+_INT_TYPES = {"int2", "int4", "int8"}
+_FLOAT_TYPES = {"float4", "float8"}
+
+
+def parameterize(sql: str) -> tuple[Optional[str], list]:
+    """
+    Replaces literals compared against columns (and LIMIT/OFFSET counts)
+    with $n placeholders, so queries differing only in those values share
+    one prepared statement. Returns (None, []) when nothing can be replaced
+    or the statement already uses placeholders.
+    """
+    if "$" in sql:
+        return None, []
+
+    parts, values, previous = [], [], None
+    for match in _TOKEN.finditer(sql):
+        kind, token = match.lastgroup, match.group()
+        if kind in ("space", "comment"):
+            parts.append(token)
+            continue
+
+        if kind == "string" and previous in _COMPARISONS:
+            values.append(token[1:-1].replace("''", "'"))
+            token = f"${len(values)}"
+        elif kind == "number" and (previous in _COMPARISONS or previous in _ROW_COUNTS):
+            values.append(Decimal(token) if any(c in token for c in ".eE") else int(token))
+            token = f"${len(values)}"
+
+        parts.append(token)
+        previous = token.lower() if kind in ("word", "op") else kind
+
+    if not values:
+        return None, []
+    return "".join(parts), values
+
+
+def coerce(value: Any, type_name: str) -> Any:
+    """
+    Converts a literal's Python value to what asyncpg expects for the
+    parameter type Postgres inferred. Raises ValueError when it cannot.
+    """
+    if isinstance(value, str):
+        if type_name in _TEXT_TYPES:
+            return value
+        if type_name in _INT_TYPES:
+            return int(value)
+        if type_name in _FLOAT_TYPES:
+            return float(value)
+        if type_name == "numeric":
+            return Decimal(value)
+        if type_name == "date":
+            return datetime.date.fromisoformat(value)
+        if type_name == "timestamp":
+            return datetime.datetime.fromisoformat(value)
+        if type_name == "timestamptz":
+            parsed = datetime.datetime.fromisoformat(value)
+            if parsed.tzinfo is None:
+                # Postgres would read it in the session time zone; leave it to Postgres.
+                raise ValueError("timestamptz literal without a time zone")
+            return parsed
+        if type_name == "uuid":
+            return uuid.UUID(value)
+        if type_name == "bool":
+            return {"t": True, "true": True, "f": False, "false": False}[value.lower()]
+    else:
+        if type_name in _INT_TYPES and value == int(value):
+            return int(value)
+        if type_name in _FLOAT_TYPES:
+            return float(value)
+        if type_name == "numeric":
+            return Decimal(value)
+    raise ValueError(f"cannot bind {value!r} as {type_name}")
+
+
+# Connections whose statement caches are mirrored; older ones have been
+# closed or recycled by the pool.
+_MAX_CONNECTIONS = 256
+
+
+# Errors meaning a cached statement no longer matches the server, e.g.
+# after DDL changed a column type. asyncpg raises a bare DataError (not one
+# of its SQLSTATE subclasses) when an argument does not fit the parameter.
+STALE_STATEMENT_ERRORS = (asyncpg.InvalidCachedStatementError, asyncpg.InterfaceError)
+
+
+class StatementCache:
+    """
+    Turns SQL into the text to run plus bind arguments. Literals are
+    parameterized first, so queries differing only in those values share
+    one statement; running that text with the connection's own fetch or
+    cursor lets asyncpg's per-connection statement cache (sized by the
+    pool's `statement_cache_size`) skip the parse.
+    PreparedStatement objects are not kept: asyncpg invalidates them when
+    their connection goes back to the pool. What is kept, per query text
+    and least recently used first out, is what binding needs without a
+    round trip: the parameter types Postgres inferred and the result
+    columns. A shape whose literals cannot be bound falls back to the
+    original SQL.
+
+    `hits` and `misses` count statements run on a connection that already
+    had (or did not have) them prepared, tracked with a mirror of each
+    connection's LRU. `shape_hits` and `shape_misses` count lookups of the
+    process-wide descriptions.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.shape_hits = 0
+        self.shape_misses = 0
+        self.fallbacks = 0
+        self.evictions = 0
+        self._shapes: OrderedDict[str, tuple[list[str], list[str]]] = OrderedDict()
+        # Server pid -> query texts asyncpg holds prepared on that connection.
+        self._prepared: OrderedDict[int, OrderedDict[str, None]] = OrderedDict()
+
+    async def prepare(self, conn: asyncpg.Connection, sql: str) -> tuple[str, list, list[str]]:
+        """
+        Returns (query, args, columns) to run on `conn`. Describes new
+        queries outside of any transaction the caller may open later, so a
+        template Postgres rejects does not abort it.
+        """
+        template, values = parameterize(sql)
+        if template is not None:
+            try:
+                param_types, columns = await self._describe(conn, template)
+                args = [coerce(value, type_name) for value, type_name in zip(values, param_types)]
+                self.track(conn, template)
+                return template, args, columns
+            except (ValueError, KeyError, asyncpg.PostgresError) as e:
+                self.fallbacks += 1
+                logger.debug(f"Running statement unparameterized: {e}")
+        _, columns = await self._describe(conn, sql)
+        self.track(conn, sql)
+        return sql, [], columns
+
+    def track(self, conn: asyncpg.Connection, query: str) -> bool:
+        """
+        Records that `query` is about to run on `conn` through asyncpg's
+        statement cache and returns whether it is already prepared there.
+        `prepare` calls this for the statements it returns; callers running
+        other cached statements on the connection (the guard's EXPLAIN) call
+        it themselves, as those take slots in the same LRU.
+        """
+        pid = conn.get_server_pid()
+        prepared = self._prepared.get(pid)
+        if prepared is None:
+            prepared = self._prepared[pid] = OrderedDict()
+            while len(self._prepared) > _MAX_CONNECTIONS:
+                self._prepared.popitem(last=False)
+        self._prepared.move_to_end(pid)
+
+        hit = query in prepared
+        if hit:
+            prepared.move_to_end(query)
+            self.hits += 1
+        else:
+            prepared[query] = None
+            while len(prepared) > self.capacity:
+                prepared.popitem(last=False)
+            self.misses += 1
+        return hit
+
+    def invalidate(self, query: str, error: BaseException) -> bool:
+        """
+        Forgets `query` if `error` says its description is stale, so the
+        next call describes it again. Returns whether it did.
+        """
+        if not (isinstance(error, STALE_STATEMENT_ERRORS) or type(error) is asyncpg.DataError):
+            return False
+        if self._shapes.pop(query, None) is not None:
+            self.evictions += 1
+            logger.debug(f"Evicted cached statement after {type(error).__name__}: {query}")
+        # asyncpg re-prepares it on the connection next time.
+        for prepared in self._prepared.values():
+            prepared.pop(query, None)
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shape_hits": self.shape_hits,
+            "shape_misses": self.shape_misses,
+            "fallbacks": self.fallbacks,
+            "evictions": self.evictions,
+            "size": len(self._shapes),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def _describe(self, conn: asyncpg.Connection, query: str) -> tuple[list[str], list[str]]:
+        shape = self._shapes.get(query)
+        if shape is not None:
+            self._shapes.move_to_end(query)
+            self.shape_hits += 1
+            return shape
+
+        stmt = await conn.prepare(query)
+        # Counted once the description is known good; a failed prepare is a fallback.
+        self.shape_misses += 1
+        shape = ([param.name for param in stmt.get_parameters()], [attr.name for attr in stmt.get_attributes()])
+        self._shapes[query] = shape
+        while len(self._shapes) > self.capacity:
+            self._shapes.popitem(last=False)
+        return shape
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# A worker dying sooner than this after its start is restarted with a delay.
+_MIN_WORKER_LIFETIME = 1.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_workers(run_worker: Callable[[socket.socket], Awaitable[None]], host: str, port: int, workers: int) -> None:
+    """
+    Binds one listening socket and forks `workers` processes that each run
+    `run_worker(sock)` on their own event loop; the kernel spreads accepted
+    connections across them. The parent only supervises: it restarts
+    workers that die and forwards SIGTERM. Must be called before any event
+    loop or database connection exists in this process.
+    """
+    sock = bind_socket(host, port)
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                asyncio.run(run_worker(sock))
+            except BaseException:
+                logger.exception(f"Worker {os.getpid()} failed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        # A terminal's Ctrl+C already reaches the whole process group.
+        if signum != signal.SIGINT:
+            for pid in children:
+                os.kill(pid, signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Serving on {host}:{port} with {workers} workers")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < _MIN_WORKER_LIFETIME:
+            time.sleep(_MIN_WORKER_LIFETIME)
+        if not stopping:
+            spawn()
+    sock.close()
@@ -8,4 +8,28 @@ def load_db_config(filename='db_config.ini', section='database'):
         params = {key: parser.get(section, key) for key in parser.options(section)}
         return params
     else:
-        raise Exception(f'Section {section} not found in the {filename} file')
\ No newline at end of file
+        raise Exception(f'Section {section} not found in the {filename} file')
+
+def load_section(section: str, filename='config.ini') -> dict:
+    """
+    Returns the raw string options of one section of the application config.
+    Missing sections yield an empty dict so callers can fall back to defaults.
+    """
+    parser = configparser.ConfigParser()
+    parser.read(filename)
+
+    if parser.has_section(section):
+        return dict(parser.items(section))
+    return {}
+
+def as_bool(value, default: bool = False) -> bool:
+    """
+    Reads a boolean option from load_section the way ConfigParser.getboolean
+    does (1/0, yes/no, true/false, on/off). Missing options give `default`.
+    """
+    if value is None:
+        return default
+    try:
+        return configparser.ConfigParser.BOOLEAN_STATES[str(value).lower()]
+    except KeyError:
+        raise ValueError(f"Not a boolean: {value}")
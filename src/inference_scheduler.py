@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Raised when a job is rejected because the inference queue is full."""
+
+
+class InferenceTimeoutError(TimeoutError):
+    """Raised when a job does not finish within the per-request timeout."""
+
+
+class InferenceScheduler:
+    """
+    Runs blocking model calls on a dedicated thread pool so the event loop
+    stays free. At most `workers` jobs run at once and at most `max_queue`
+    wait behind them; further jobs are rejected immediately.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, timeout: float = 120.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float | None = None, **kwargs) -> Any:
+        """
+        Schedules `fn(*args, **kwargs)` and awaits its result.
+        A job that times out while still queued is dropped; one that is
+        already running finishes in the background and keeps its slot.
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise InferenceQueueFullError(
+                    f"Inference queue is full ({self._pending - self._running} waiting)."
+                )
+            self._pending += 1
+
+        submitted = time.monotonic()
+        try:
+            future = self._executor.submit(self._run_job, submitted, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise InferenceTimeoutError(f"Inference did not finish within {timeout or self.timeout}s.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._pending - self._running,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "avg_wait_seconds": self._wait_total / started if started else 0.0,
+                "max_wait_seconds": self._wait_max,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_job(self, submitted: float, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        waited = time.monotonic() - submitted
+        with self._lock:
+            self._running += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Inference job failed: {future.exception()}")
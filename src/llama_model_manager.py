@@ -1,28 +1,190 @@
 import atexit
-from llama_cpp import Llama, LLAMA_POOLING_TYPE_NONE
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+from src.config import as_bool, load_section
+from src.metrics import GENERATION_TOKENS_PER_SECOND, TOKENS
+from src.operation_timer import OperationTimer
+
+if TYPE_CHECKING:
+    # llama_cpp is imported on first load so importing the app stays fast.
+    from llama_cpp import Llama
+    from src.prompt_cache import PrefixCache
+
+logger = logging.getLogger(__name__)
+
 
 class LlamaModelManager:
+    """
+    Process-wide pool of `pool_size` Llama contexts.
+    Each context gets its own slice of the CPU cores so concurrent
+    generations do not oversubscribe them. Callers check a context out,
+    use it exclusively and check it back in.
+    """
     _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_path: str, pool_size: int = 1, n_ctx: int = 2048, n_threads: int = 0,
+                 prompt_cache_bytes: Optional[int] = 0, use_mmap: bool = True, use_mlock: bool = False):
+        self.model_path = model_path
+        self.pool_size = max(1, pool_size)
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads or max(1, (os.cpu_count() or 1) // self.pool_size)
+        self.prompt_cache_bytes = prompt_cache_bytes
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        self._models: list["Llama"] = []
+        self._caches: list["PrefixCache"] = []
+        self._idle: queue.Queue["Llama"] = queue.Queue()
+        self._load_lock = threading.Lock()
 
     @classmethod
-    def get_instance(cls):
+    def get_instance(cls) -> "LlamaModelManager":
         if cls._instance is None:
-            cls._instance = Llama(
-                model_path='./Phi-3.5-mini-instruct-Q6_K_L.gguf',
-                verbose=False,
-                temperature=0,
-                pooling_type=LLAMA_POOLING_TYPE_NONE,
-                n_ctx=2048
-            )
-            atexit.register(cls._cleanup)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    model_config = load_section("model")
+                    # "auto" sizes each context's prompt cache for one full context of KV state.
+                    prompt_cache_bytes = model_config.get("prompt_cache_bytes", "auto")
+                    cls._instance = cls(
+                        model_path=model_config.get("path", "./Phi-3.5-mini-instruct-Q6_K_L.gguf"),
+                        pool_size=int(model_config.get("pool_size", 1)),
+                        n_ctx=int(model_config.get("n_ctx", 2048)),
+                        n_threads=int(model_config.get("n_threads", 0)),
+                        prompt_cache_bytes=None if prompt_cache_bytes == "auto" else int(prompt_cache_bytes),
+                        use_mmap=as_bool(model_config.get("use_mmap"), True),
+                        use_mlock=as_bool(model_config.get("use_mlock"), False),
+                    )
+                    atexit.register(cls._cleanup)
         return cls._instance
 
+    def warm_up(self) -> None:
+        """
+        Loads every context in the pool. Safe to call more than once.
+        With use_mmap the weights are mapped rather than read, so every
+        context in the pool (and the page cache across restarts) shares one
+        copy; use_mlock pins them in RAM.
+        """
+        from llama_cpp import Llama, LLAMA_POOLING_TYPE_NONE
+        from src.prompt_cache import PrefixCache
+
+        with self._load_lock:
+            while len(self._models) < self.pool_size:
+                model = Llama(
+                    model_path=self.model_path,
+                    verbose=False,
+                    temperature=0,
+                    pooling_type=LLAMA_POOLING_TYPE_NONE,
+                    n_ctx=self.n_ctx,
+                    n_threads=self.n_threads,
+                    n_threads_batch=self.n_threads,
+                    use_mmap=self.use_mmap,
+                    use_mlock=self.use_mlock,
+                )
+                # Llama tokenizes through this method during completions; timing
+                # the instance attribute isolates tokenization from generation.
+                model.tokenize = OperationTimer("tokenization")(model.tokenize)
+                if self.prompt_cache_bytes is None or self.prompt_cache_bytes > 0:
+                    cache = PrefixCache(model, self.prompt_cache_bytes)
+                    model.set_cache(cache)
+                    self._caches.append(cache)
+                self._models.append(model)
+                self._idle.put(model)
+                logger.info(f"Loaded model context {len(self._models)}/{self.pool_size} ({self.n_threads} threads)")
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator["Llama"]:
+        """
+        Borrows a context for exclusive use, blocking until one is free.
+        """
+        if len(self._models) < self.pool_size:
+            self.warm_up()
+        model = self._idle.get(timeout=timeout)
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+    def create_chat_completion(self, **kwargs) -> dict:
+        with self.checkout() as model:
+            with OperationTimer("generation") as timer:
+                response = model.create_chat_completion(**kwargs)
+        usage = response.get("usage") or {}
+        completion_tokens = usage.get("completion_tokens", 0)
+        TOKENS.inc(usage.get("prompt_tokens", 0), "prompt")
+        TOKENS.inc(completion_tokens, "completion")
+        if completion_tokens and timer.elapsed:
+            GENERATION_TOKENS_PER_SECOND.observe(completion_tokens / timer.elapsed)
+        return response
+
+    def stream_chat_completion(self, **kwargs) -> Iterator[dict]:
+        """
+        create_chat_completion(stream=True). The context stays checked out
+        until the generator is exhausted or closed; closing it stops decoding.
+        """
+        with self.checkout() as model:
+            completion_tokens = 0
+            timer = OperationTimer("generation")
+            try:
+                with timer:
+                    stream = model.create_chat_completion(**kwargs, stream=True)
+                    try:
+                        for chunk in stream:
+                            # llama.cpp streams one chunk per decoded token.
+                            if chunk["choices"][0]["delta"].get("content"):
+                                completion_tokens += 1
+                            yield chunk
+                    finally:
+                        stream.close()
+            finally:
+                TOKENS.inc(completion_tokens, "completion")
+                if completion_tokens and timer.elapsed:
+                    GENERATION_TOKENS_PER_SECOND.observe(completion_tokens / timer.elapsed)
+
+    def prime(self, **kwargs) -> None:
+        """
+        Runs a one-token completion on every context so the shared prompt
+        prefix is evaluated, and pins the resulting state in the context's
+        prompt cache before the first real question.
+        """
+        self.warm_up()
+        held = [self._idle.get() for _ in range(self.pool_size)]
+        try:
+            for model in held:
+                model.create_chat_completion(**kwargs, max_tokens=1)
+                if model.cache is not None:
+                    model.cache.pin()
+        finally:
+            for model in held:
+                self._idle.put(model)
+
+    def stats(self) -> dict:
+        prefix = {"lookups": 0, "hits": 0, "prompt_tokens": 0, "reused_tokens": 0, "cache_bytes": 0, "pinned_bytes": 0}
+        for cache in self._caches:
+            for key, value in cache.stats().items():
+                prefix[key] += value
+        prefix["hit_rate"] = prefix["hits"] / prefix["lookups"] if prefix["lookups"] else 0.0
+        prefix["reused_token_ratio"] = (
+            prefix["reused_tokens"] / prefix["prompt_tokens"] if prefix["prompt_tokens"] else 0.0
+        )
+        return {
+            "pool_size": self.pool_size,
+            "loaded": len(self._models),
+            "idle": self._idle.qsize(),
+            "n_threads": self.n_threads,
+            "prefix_cache": prefix,
+        }
+
     @classmethod
     def _cleanup(cls):
         if cls._instance is not None:
-            try:
-                cls._instance.close()  # ✅ Use the actual method provided by llama-cpp-python
-            except Exception as e:
-                print(f"Warning: Failed to close Llama model cleanly: {e}")
-            finally:
-                cls._instance = None
+            for model in cls._instance._models:
+                try:
+                    model.close()  # ✅ Use the actual method provided by llama-cpp-python
+                except Exception as e:
+                    print(f"Warning: Failed to close Llama model cleanly: {e}")
+            cls._instance._models.clear()
+            cls._instance = None
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+if TYPE_CHECKING:
+    from fastmcp import Client
+
+logger = logging.getLogger(__name__)
+
+
+class McpClientPool:
+    """
+    A fixed set of long-lived MCP client sessions.
+    The connection and MCP initialize handshake are paid once per session,
+    not per request. Checkout blocks once `size` sessions are in use, which
+    caps concurrency against the MCP server.
+    """
+
+    def __init__(self, url: str, size: int = 4, health_check_interval: float = 30.0, acquire_timeout: float = 10.0):
+        self.url = url
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._idle: asyncio.Queue[Optional["Client"]] = asyncio.Queue()
+        self._health_task: Optional[asyncio.Task] = None
+        self._reconnects = 0
+
+    async def start(self) -> None:
+        """
+        Opens the sessions and starts the health-check loop.
+        A session that cannot connect yet is retried on first checkout.
+        """
+        for _ in range(self.size):
+            try:
+                self._idle.put_nowait(await self._connect())
+            except Exception as e:
+                logger.warning(f"MCP session to {self.url} not available yet: {e}")
+                self._idle.put_nowait(None)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        while not self._idle.empty():
+            await self._disconnect(self._idle.get_nowait())
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator["Client"]:
+        """
+        Checks out a connected session. If the caller fails with a transport
+        error the session is dropped and reopened on next checkout.
+        """
+        client = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+        try:
+            if client is None or not client.is_connected():
+                await self._disconnect(client)
+                client = None
+                client = await self._connect()
+                self._reconnects += 1
+            yield client
+        except Exception:
+            if client is not None and not await self._is_healthy(client):
+                await self._disconnect(client)
+                client = None
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "in_use": self.size - self._idle.qsize(),
+            "reconnects": self._reconnects,
+        }
+
+    async def _connect(self) -> "Client":
+        from fastmcp import Client
+
+        client = Client(self.url)
+        await client.__aenter__()
+        logger.debug(f"Opened MCP session to {self.url}")
+        return client
+
+    async def _disconnect(self, client: Optional["Client"]) -> None:
+        if client is None:
+            return
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as e:
+            logger.debug(f"Ignoring error while closing MCP session: {e}")
+
+    async def _is_healthy(self, client: "Client") -> bool:
+        try:
+            return client.is_connected() and await client.ping()
+        except Exception:
+            return False
+
+    async def _health_loop(self) -> None:
+        """
+        Pings idle sessions and reopens the ones that no longer respond.
+        """
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for _ in range(self._idle.qsize()):
+                try:
+                    client = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    if client is None or not await self._is_healthy(client):
+                        await self._disconnect(client)
+                        client = None
+                        client = await self._connect()
+                        self._reconnects += 1
+                except Exception as e:
+                    logger.warning(f"MCP session health check failed: {e}")
+                finally:
+                    self._idle.put_nowait(client)
@@ -1,19 +1,79 @@
 import time
 import asyncio
 from functools import wraps
+from typing import Callable, Optional, Union
+from src.metrics import OPERATION_SECONDS, Histogram
+
 
 class OperationTimer:
-    def __init__(self, func):
-        self.func = func
-        wraps(func)(self)  # Preserve metadata (e.g., __name__, __doc__)
+    """
+    Records the wall time of a pipeline stage into a histogram.
+
+    Works as a decorator on sync and async functions and as a (sync or
+    async) context manager:
+
+        @OperationTimer("schema_fetch")
+        async def fetch_schema(): ...
+
+        with OperationTimer("prompt_build") as timer:
+            ...
+        timer.elapsed
+
+    Decorating without a stage name (`@OperationTimer`) uses the function
+    name. Timing uses the monotonic perf_counter clock and is recorded
+    whether or not the operation raises.
+    """
+
+    def __init__(self, stage: Union[str, Callable], histogram: Histogram = OPERATION_SECONDS):
+        self.histogram = histogram
+        self.elapsed: Optional[float] = None
+        self._start: Optional[float] = None
+        self._wrapped = None
+        if callable(stage):
+            self.stage = stage.__name__
+            self._wrapped = self(stage)
+            wraps(stage)(self)
+        else:
+            self.stage = stage
 
     def __call__(self, *args, **kwargs):
-        if asyncio.iscoroutinefunction(self.func):
-            @wraps(self.func)
+        if self._wrapped is not None:
+            # Used bare as @OperationTimer: this instance stands in for the function.
+            return self._wrapped(*args, **kwargs)
+
+        func = args[0]
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                start_time = time.time()
-                result = await self.func(*args, **kwargs)
-                elapsed = time.time() - start_time
-                print(f"{self.func.__name__} took {elapsed:.2f} seconds.")
-                return result
-            return async_wrapper(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(time.perf_counter() - start)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(time.perf_counter() - start)
+        return wrapper
+
+    def record(self, seconds: float) -> None:
+        self.elapsed = seconds
+        self.histogram.observe(seconds, self.stage)
+
+    def __enter__(self) -> "OperationTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.record(time.perf_counter() - self._start)
+
+    async def __aenter__(self) -> "OperationTimer":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__exit__(*exc_info)
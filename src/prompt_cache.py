@@ -0,0 +1,103 @@
+import logging
+import threading
+from typing import Optional
+from llama_cpp import Llama, LlamaRAMCache, LlamaState
+
+logger = logging.getLogger(__name__)
+
+
+def kv_bytes_per_token(model: Llama) -> int:
+    """
+    KV cache bytes one token takes in a saved state, from the GGUF metadata
+    and llama.cpp's default f16 cache: keys and values for every layer.
+    """
+    metadata = model.metadata
+    arch = metadata.get("general.architecture", "llama")
+    layers = int(metadata[f"{arch}.block_count"])
+    heads = int(metadata.get(f"{arch}.attention.head_count", 1))
+    kv_heads = int(metadata.get(f"{arch}.attention.head_count_kv", heads))
+    return 2 * layers * (model.n_embd() * kv_heads // heads) * 2
+
+
+class PrefixCache(LlamaRAMCache):
+    """
+    llama.cpp state cache keyed by prompt tokens.
+    On each completion llama.cpp restores the saved state sharing the longest
+    token prefix with the new prompt, so the fixed system prompt, few-shot
+    examples and an unchanged schema block are not re-evaluated.
+
+    The state saved by `pin` (the primed shared prefix) is kept outside the
+    LRU, so the full-prompt states llama.cpp saves after every completion
+    cannot evict it. A lookup counts as a hit only when the tokens reused
+    from the cache or the live KV state cover everything the prompt shares
+    with that pinned prefix.
+    With `capacity_bytes` None the LRU is sized for one full context.
+    """
+
+    def __init__(self, model: Llama, capacity_bytes: Optional[int] = None):
+        full_context = model.n_ctx() * kv_bytes_per_token(model)
+        if capacity_bytes is None:
+            capacity_bytes = full_context
+        elif capacity_bytes < full_context:
+            logger.warning(
+                f"prompt_cache_bytes ({capacity_bytes}) is below one full context "
+                f"({full_context} bytes); saved prompts will evict each other"
+            )
+        super().__init__(capacity_bytes=capacity_bytes)
+        self.model = model
+        self.pinned: Optional[LlamaState] = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+
+    def pin(self) -> None:
+        """
+        Keeps the model's current state, normally right after evaluating the
+        shared prefix, for as long as the cache lives.
+        """
+        state = self.model.save_state()
+        # llama.cpp saved the same state into the LRU after the priming completion.
+        self.cache_state.pop(tuple(state.input_ids.tolist()), None)
+        self.pinned = state
+
+    def __getitem__(self, key):
+        key = tuple(key)
+        live_prefix = Llama.longest_token_prefix(self.model._input_ids.tolist(), key)
+        state, cached_prefix = None, 0
+        try:
+            state = super().__getitem__(key)
+            cached_prefix = Llama.longest_token_prefix(state.input_ids.tolist(), key)
+        except KeyError:
+            pass
+
+        shared_prefix = 0
+        if self.pinned is not None:
+            shared_prefix = Llama.longest_token_prefix(self.pinned.input_ids.tolist(), key)
+            if shared_prefix > cached_prefix:
+                state, cached_prefix = self.pinned, shared_prefix
+
+        reused = max(live_prefix, cached_prefix)
+        self._record(key, reused, hit=shared_prefix > 0 and reused >= shared_prefix)
+        if state is None:
+            raise KeyError("Key not found")
+        return state
+
+    def _record(self, key: tuple, reused: int, hit: bool) -> None:
+        with self._lock:
+            self.lookups += 1
+            self.hits += int(hit)
+            self.prompt_tokens += len(key)
+            self.reused_tokens += reused
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "prompt_tokens": self.prompt_tokens,
+                "reused_tokens": self.reused_tokens,
+                "cache_bytes": self.cache_size,
+                "pinned_bytes": self.pinned.llama_state_size if self.pinned else 0,
+            }
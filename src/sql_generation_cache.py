@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from services.shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_LITERAL = re.compile(r"(?<!\w)'[^']*'(?!\w)|(?<!\w)\"[^\"]*\"(?!\w)|\b\d+(?:\.\d+)?\b")
+
+
+class SqlGenerationCache:
+    """
+    Maps natural-language questions to previously generated SQL.
+    Entries are keyed by the schema fingerprint so a schema change never
+    serves SQL written against an older schema. Lookups try the normalized
+    question text first, then, if `similarity_threshold` is above zero,
+    the most similar cached question whose quoted values and numbers match.
+    Entries are evicted least-recently-used and persisted to `path`.
+    With a `store`, exact entries are also shared with the other workers.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = 1000, similarity_threshold: float = 0.0,
+                 save_every: int = 20, store: Optional["SharedStore"] = None):
+        self.path = path
+        self.store = store
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.save_every = save_every
+        self._entries: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._unsaved = 0
+        self.exact_hits = 0
+        self.shared_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        literals = _LITERAL.findall(question)
+        text = _LITERAL.sub(" ", question.lower())
+        return " ".join(_WORD.findall(text) + [literal.lower() for literal in literals])
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        key = (fingerprint, self.normalize(question))
+        sql = self._entries.get(key)
+        if sql is not None:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return sql
+
+        if self.store:
+            sql = self.store.cache.get(("generation", *key))
+            if sql is not None:
+                self._remember(key, sql)
+                self.shared_hits += 1
+                return sql
+
+        if self.similarity_threshold > 0:
+            similar = self._find_similar(question, fingerprint)
+            if similar is not None:
+                self._entries.move_to_end(similar)
+                self.similar_hits += 1
+                return self._entries[similar]
+
+        self.misses += 1
+        return None
+
+    def put(self, question: str, fingerprint: str, sql: str) -> None:
+        key = (fingerprint, self.normalize(question))
+        self._remember(key, sql)
+        if self.store:
+            self.store.cache.set(("generation", *key), sql)
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def _remember(self, key: tuple[str, str], sql: str) -> None:
+        self._entries[key] = sql
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for fingerprint, question, sql in json.load(f)[-self.max_entries:]:
+                    self._entries[(fingerprint, question)] = sql
+            logger.info(f"Loaded {len(self._entries)} cached SQL generations from {self.path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable SQL generation cache {self.path}: {e}")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([[fp, question, sql] for (fp, question), sql in self._entries.items()], f)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            logger.warning(f"Failed to persist SQL generation cache to {self.path}: {e}")
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.shared_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "shared_hits": self.shared_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _find_similar(self, question: str, fingerprint: str) -> Optional[tuple[str, str]]:
+        # Questions differing in a quoted name or a number need different SQL.
+        literals = sorted(literal.lower() for literal in _LITERAL.findall(question))
+        words = set(_WORD.findall(_LITERAL.sub(" ", question.lower())))
+        if not words:
+            return None
+
+        best_key, best_score = None, self.similarity_threshold
+        for key in self._entries:
+            cached_fingerprint, cached_question = key
+            if cached_fingerprint != fingerprint:
+                continue
+            cached_words = set(_WORD.findall(_LITERAL.sub(" ", cached_question)))
+            if sorted(_LITERAL.findall(cached_question)) != literals:
+                continue
+            score = len(words & cached_words) / len(words | cached_words)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
@@ -0,0 +1,55 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """
+    Tracks the warm-up phases a service needs before it can take traffic
+    and how long each one took. The service is ready once every phase has
+    completed; `ready_seconds` is the time from construction (normally app
+    import) to that point.
+    """
+
+    def __init__(self, *phases: str):
+        self.started = time.perf_counter()
+        self.pending = set(phases)
+        self.durations: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.ready_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    @asynccontextmanager
+    async def phase(self, name: str) -> AsyncIterator[None]:
+        """
+        Times one phase. The phase stays pending if the block raises, so it
+        can be retried.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            raise
+        self.durations[name] = time.perf_counter() - start
+        self.errors.pop(name, None)
+        self.pending.discard(name)
+        if not self.pending and self.ready_seconds is None:
+            self.ready_seconds = time.perf_counter() - self.started
+            logger.info(f"Ready {self.ready_seconds:.2f}s after start: {self.durations}")
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "uptime_seconds": time.perf_counter() - self.started,
+            "phase_seconds": dict(self.durations),
+            "pending": sorted(self.pending),
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,79 @@
+"""
+Integration tests run against a real PostgreSQL given by TEST_DATABASE_URL
+(an asyncpg DSN, e.g. postgresql://postgres@localhost/postgres); they are
+skipped when it is not set. Each test gets a throwaway schema.
+"""
+import asyncio
+import os
+import secrets
+from configparser import ConfigParser
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_DDL = """
+    CREATE SCHEMA {schema};
+    SET search_path = {schema};
+    CREATE TABLE album (
+        album_id integer PRIMARY KEY,
+        title varchar(50) NOT NULL,
+        release_year integer
+    );
+    INSERT INTO album SELECT i, 'Album ' || i, 1960 + i % 65 FROM generate_series(1, 200) AS i;
+    ANALYZE;
+"""
+
+
+@pytest.fixture(scope="session")
+def dsn() -> str:
+    value = os.environ.get("TEST_DATABASE_URL")
+    if not value:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return value
+
+
+@pytest.fixture
+def schema(dsn):
+    name = f"test_{secrets.token_hex(4)}"
+
+    asyncpg = pytest.importorskip("asyncpg")
+
+    async def run(statement: str):
+        conn = await asyncpg.connect(dsn)
+        try:
+            await conn.execute(statement)
+        finally:
+            await conn.close()
+
+    asyncio.run(run(SCHEMA_DDL.format(schema=name)))
+    yield name
+    asyncio.run(run(f"DROP SCHEMA {name} CASCADE"))
+
+
+def write_config(directory, overrides: dict) -> str:
+    """
+    Writes the repository's config.ini with {section: {option: value}}
+    overrides into `directory` and returns its path.
+    """
+    config = ConfigParser()
+    config.read(os.path.join(ROOT, "config.ini"))
+    config["export"]["directory"] = str(directory / "exports")
+    for section, options in overrides.items():
+        for option, value in options.items():
+            config[section][option] = str(value)
+    path = directory / "config.ini"
+    with open(path, "w") as f:
+        config.write(f)
+    return str(path)
+
+
+@pytest.fixture
+def config_file(tmp_path, dsn, schema):
+    """
+    Call with overrides to get a config.ini pointed at the test schema.
+    """
+    def write(overrides: dict | None = None) -> str:
+        database = {"database": {"url": dsn, "schema": schema}}
+        return write_config(tmp_path, {**database, **(overrides or {})})
+    return write
@@ -0,0 +1,64 @@
+import asyncio
+
+from services.batch_executor import run_batch
+
+
+def test_runs_at_most_max_parallel_at_a_time():
+    running, peak = 0, 0
+
+    async def execute(sql):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return sql
+
+    results = asyncio.run(run_batch(execute, [f"SELECT {i}" for i in range(7)], max_parallel=3, timeout=0))
+    assert peak == 3
+    assert [item["result"] for item in results] == [f"SELECT {i}" for i in range(7)]
+
+
+def test_max_parallel_below_one_still_runs():
+    async def execute(sql):
+        return sql
+
+    results = asyncio.run(run_batch(execute, ["SELECT 1", "SELECT 2"], max_parallel=0, timeout=0))
+    assert [item["result"] for item in results] == ["SELECT 1", "SELECT 2"]
+
+
+def test_timeout_applies_to_each_statement():
+    cancelled = []
+
+    async def execute(sql):
+        try:
+            await asyncio.sleep(float(sql))
+        except asyncio.CancelledError:
+            cancelled.append(sql)
+            raise
+        return sql
+
+    # Run one at a time, so a batch-wide timeout would fail all three.
+    results = asyncio.run(run_batch(execute, ["0.05", "5", "0.05"], max_parallel=1, timeout=0.1))
+    assert results[1] == {"index": 1, "sql": "5", "error": "Error: TimeoutError: exceeded 0.1s"}
+    assert [results[0]["result"], results[2]["result"]] == ["0.05", "0.05"]
+    assert cancelled == ["5"]
+
+
+def test_failures_keep_input_order():
+    async def execute(sql):
+        # Later statements finish first.
+        await asyncio.sleep(0.01 * (5 - len(sql)))
+        if sql == "bad":
+            raise ValueError("boom")
+        if sql == "drop":
+            return "Only SELECT statements are allowed."
+        return [sql]
+
+    results = asyncio.run(run_batch(execute, ["a", "bad", "bb", "drop"], max_parallel=4, timeout=0))
+    assert results == [
+        {"index": 0, "sql": "a", "result": ["a"]},
+        {"index": 1, "sql": "bad", "error": "Error: ValueError: boom"},
+        {"index": 2, "sql": "bb", "result": ["bb"]},
+        {"index": 3, "sql": "drop", "error": "Only SELECT statements are allowed."},
+    ]
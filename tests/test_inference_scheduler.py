@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.inference_scheduler import InferenceQueueFullError, InferenceScheduler, InferenceTimeoutError
+
+
+def blocker():
+    """A job that holds its worker until the returned event is set."""
+    release = threading.Event()
+
+    def job():
+        release.wait(5)
+        return "done"
+
+    return job, release
+
+
+def test_queue_full_rejects_without_waiting():
+    scheduler = InferenceScheduler(workers=1, max_queue=1, timeout=5)
+    job, release = blocker()
+
+    async def run():
+        running = asyncio.create_task(scheduler.run(job))
+        queued = asyncio.create_task(scheduler.run(job))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        with pytest.raises(InferenceQueueFullError):
+            await scheduler.run(job)
+        rejected_in = time.monotonic() - started
+        stats = scheduler.stats()
+        release.set()
+        return rejected_in, stats, await asyncio.gather(running, queued)
+
+    try:
+        rejected_in, stats, results = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+    assert rejected_in < 0.5
+    assert (stats["running"], stats["queue_depth"], stats["rejected"]) == (1, 1, 1)
+    assert results == ["done", "done"]
+    assert scheduler.stats()["completed"] == 2
+
+
+def test_queued_job_that_times_out_is_dropped():
+    scheduler = InferenceScheduler(workers=1, max_queue=1, timeout=5)
+    job, release = blocker()
+    ran = threading.Event()
+
+    async def run():
+        running = asyncio.create_task(scheduler.run(job))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceTimeoutError):
+            await scheduler.run(ran.set, timeout=0.05)
+        # The dropped job no longer holds a queue slot.
+        queue_depth = scheduler.stats()["queue_depth"]
+        release.set()
+        await running
+        await asyncio.sleep(0.05)
+        return queue_depth
+
+    try:
+        queue_depth = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+    assert queue_depth == 0
+    assert not ran.is_set()
+    stats = scheduler.stats()
+    assert (stats["timeouts"], stats["completed"], stats["queue_depth"]) == (1, 1, 0)
+
+
+def test_running_job_that_times_out_keeps_its_slot():
+    scheduler = InferenceScheduler(workers=1, max_queue=0, timeout=5)
+    job, release = blocker()
+
+    async def run():
+        with pytest.raises(InferenceTimeoutError):
+            await scheduler.run(job, timeout=0.05)
+        # Still decoding in the background, so the only slot is taken.
+        with pytest.raises(InferenceQueueFullError):
+            await scheduler.run(job)
+        release.set()
+        await asyncio.sleep(0.05)
+        return await scheduler.run(lambda: "next")
+
+    try:
+        assert asyncio.run(run()) == "next"
+    finally:
+        scheduler.shutdown()
+    stats = scheduler.stats()
+    assert (stats["timeouts"], stats["rejected"], stats["completed"]) == (1, 1, 2)
+
+
+def test_wait_metrics_include_time_queued():
+    scheduler = InferenceScheduler(workers=1, max_queue=1, timeout=5)
+    job, release = blocker()
+
+    async def run():
+        running = asyncio.create_task(scheduler.run(job))
+        queued = asyncio.create_task(scheduler.run(lambda: "queued"))
+        await asyncio.sleep(0.2)
+        release.set()
+        return await asyncio.gather(running, queued)
+
+    try:
+        assert asyncio.run(run()) == ["done", "queued"]
+    finally:
+        scheduler.shutdown()
+    stats = scheduler.stats()
+    assert stats["max_wait_seconds"] >= 0.15
+    assert stats["max_wait_seconds"] / 2 <= stats["avg_wait_seconds"] < stats["max_wait_seconds"]
+
+
+class FakeMcpPool:
+    """Serves the schema lookups of /query without an MCP server."""
+
+    @asynccontextmanager
+    async def session(self):
+        async def read_resource(uri):
+            return [SimpleNamespace(text="fingerprint")]
+
+        async def call_tool(name, arguments):
+            return SimpleNamespace(content=[SimpleNamespace(text="CREATE TABLE album (album_id int)")])
+
+        yield SimpleNamespace(read_resource=read_resource, call_tool=call_tool)
+
+
+def test_query_route_answers_503_when_the_queue_is_full(monkeypatch):
+    from models.query_models import QueryRequest
+    from routers import sql_query_router
+    from src.sql_generation_cache import SqlGenerationCache
+
+    scheduler = InferenceScheduler(workers=1, max_queue=0, timeout=5)
+    monkeypatch.setattr(sql_query_router, "inference_scheduler", scheduler)
+    monkeypatch.setattr(sql_query_router, "mcp_pool", FakeMcpPool())
+    monkeypatch.setattr(sql_query_router, "generation_cache", SqlGenerationCache(path=None))
+    job, release = blocker()
+
+    async def run():
+        running = asyncio.create_task(scheduler.run(job))
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(HTTPException) as raised:
+                await sql_query_router.generate_sql_query(QueryRequest(question="How many albums?"))
+        finally:
+            release.set()
+            await running
+        return raised.value
+
+    try:
+        error = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "5"}
+    assert scheduler.stats()["rejected"] == 1
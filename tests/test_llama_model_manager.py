@@ -0,0 +1,12 @@
+from src.llama_model_manager import LlamaModelManager
+from tests.conftest import write_config
+
+
+def test_get_instance_reads_model_settings(tmp_path, monkeypatch):
+    write_config(tmp_path, {"model": {"use_mmap": "no", "use_mlock": "on", "prompt_cache_bytes": "auto"}})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(LlamaModelManager, "_instance", None)
+
+    manager = LlamaModelManager.get_instance()
+    assert (manager.use_mmap, manager.use_mlock) == (False, True)
+    assert manager.prompt_cache_bytes is None
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import socket
+import httpx
+import pytest
+from services.database_config import Config
+from services.postgres_mcp_server import PostgresMcpServer
+
+fastmcp = pytest.importorskip("fastmcp")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, timeout: float = 20.0) -> dict:
+    deadline = asyncio.get_running_loop().time() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                response = await client.get("/readyz")
+                if response.status_code == 200:
+                    return response.json()
+            except httpx.TransportError:
+                pass
+            if asyncio.get_running_loop().time() > deadline:
+                raise AssertionError("server did not become ready")
+            await asyncio.sleep(0.1)
+
+
+def test_run_connects_and_serves_tools(config_file):
+    port = free_port()
+    server = PostgresMcpServer(Config(config_file({"server": {"host": "127.0.0.1", "port": port}})))
+
+    async def run():
+        task = asyncio.create_task(server.run())
+        try:
+            ready = await wait_ready(f"http://127.0.0.1:{port}")
+            async with fastmcp.Client(f"http://127.0.0.1:{port}/mcp") as client:
+                result = await client.call_tool("execute_query", {"sql": "SELECT title FROM album WHERE album_id = 7"})
+            return ready, json.loads(result.content[0].text)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    ready, page = asyncio.run(run())
+    assert ready["ready"] is True
+    assert page["rows"] == [["Album 7"]]
+
+
+def test_http_app_lifespan_opens_and_closes_the_pool(config_file):
+    server = PostgresMcpServer(Config(config_file()))
+    app = server.http_app()
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            assert server.db.pool is not None
+            snapshot = await server.schema_service.cache.get()
+        return snapshot, server.db.pool.is_closing()
+
+    snapshot, closed = asyncio.run(run())
+    assert "album" in snapshot.text
+    assert closed
@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from services.pool_limits import apply_pool_limits  # noqa: E402
+
+
+def backend_pids(dsn: str, max_inactive: float, max_queries: int, pause: float = 0) -> list[int]:
+    async def run():
+        engine = create_async_engine("postgresql+asyncpg://" + dsn.split("://", 1)[1], pool_size=1, max_overflow=0)
+        apply_pool_limits(engine, max_inactive, max_queries)
+        pids = []
+        try:
+            for _ in range(4):
+                async with engine.connect() as conn:
+                    pids.append((await conn.execute(text("SELECT pg_backend_pid()"))).scalar())
+                await asyncio.sleep(pause)
+        finally:
+            await engine.dispose()
+        return pids
+
+    return asyncio.run(run())
+
+
+def test_connection_is_replaced_after_max_queries(dsn):
+    pids = backend_pids(dsn, max_inactive=0, max_queries=2)
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_idle_connection_is_replaced(dsn):
+    assert len(set(backend_pids(dsn, max_inactive=0.05, max_queries=0, pause=0.1))) == 4
+    assert len(set(backend_pids(dsn, max_inactive=60, max_queries=0))) == 1
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+llama_cpp = pytest.importorskip("llama_cpp")
+from src.prompt_cache import PrefixCache, kv_bytes_per_token  # noqa: E402
+
+# Bytes per token of the fake model below: 2 x 2 layers x 8 x 2 bytes.
+BYTES_PER_TOKEN = 64
+N_CTX = 32
+
+
+class FakeModel:
+    """
+    The parts of llama_cpp.Llama the prefix cache uses. `evaluate` stands in
+    for a completion: the context then holds `tokens` in its KV state.
+    """
+    metadata = {
+        "general.architecture": "llama",
+        "llama.block_count": "2",
+        "llama.attention.head_count": "4",
+        "llama.attention.head_count_kv": "4",
+    }
+
+    def __init__(self):
+        self._input_ids = np.array([], dtype=np.intc)
+
+    def n_ctx(self) -> int:
+        return N_CTX
+
+    def n_embd(self) -> int:
+        return 8
+
+    def evaluate(self, tokens: list[int]) -> None:
+        self._input_ids = np.array(tokens, dtype=np.intc)
+
+    def save_state(self):
+        return llama_cpp.LlamaState(
+            input_ids=self._input_ids.copy(), scores=np.zeros(0, dtype=np.single),
+            n_tokens=len(self._input_ids), llama_state=b"",
+            llama_state_size=len(self._input_ids) * BYTES_PER_TOKEN, seed=0,
+        )
+
+
+SHARED = [1, 2, 3, 4, 5, 6, 7, 8]
+
+
+def completion(model: FakeModel, cache: PrefixCache, prompt: list[int]) -> None:
+    """
+    What Llama._create_completion does with its cache around a completion.
+    """
+    try:
+        state = cache[prompt]
+        model.evaluate(list(state.input_ids))
+    except KeyError:
+        pass
+    model.evaluate(prompt + [99])
+    cache[prompt + [99]] = model.save_state()
+
+
+def test_capacity_defaults_to_one_full_context():
+    model = FakeModel()
+    assert kv_bytes_per_token(model) == BYTES_PER_TOKEN
+    assert PrefixCache(model).capacity_bytes == N_CTX * BYTES_PER_TOKEN
+
+
+def test_pinned_prefix_survives_lru_eviction():
+    model = FakeModel()
+    cache = PrefixCache(model, capacity_bytes=20 * BYTES_PER_TOKEN)
+    completion(model, cache, SHARED + [0])
+    cache.pin()
+
+    for question in range(10, 20):
+        completion(model, cache, SHARED + [question] * 8)
+    assert len(cache.cache_state) == 1
+
+    # Another context's state without the shared prefix is live; the pinned one is restored.
+    model.evaluate([50, 51])
+    state = cache[SHARED + [0, 42]]
+    assert list(state.input_ids) == SHARED + [0, 99]
+
+
+def test_hit_only_when_the_shared_prefix_is_reused():
+    model = FakeModel()
+    cache = PrefixCache(model, capacity_bytes=N_CTX * BYTES_PER_TOKEN)
+    # Nothing pinned yet: reusing a few live tokens is not a hit.
+    completion(model, cache, SHARED + [0])
+    completion(model, cache, SHARED + [5, 5])
+    assert cache.stats()["hits"] == 0
+
+    completion(model, cache, SHARED + [0])
+    cache.pin()
+    for question in range(10, 14):
+        # The live state is another question's; the pinned prefix still covers the shared part.
+        completion(model, cache, SHARED + [question, question])
+    stats = cache.stats()
+    assert (stats["lookups"], stats["hits"]) == (7, 4)
+    assert stats["pinned_bytes"] == len(SHARED + [0, 99]) * BYTES_PER_TOKEN
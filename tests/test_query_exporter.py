@@ -0,0 +1,53 @@
+import asyncio
+import os
+import pytest
+from services.query_exporter import QueryExporter
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    directory = tmp_path / "exports"
+    directory.mkdir()
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.csv").write_text("secret\n")
+    (directory / "report.csv").write_text("n\n1\n")
+    os.symlink(outside, directory / "escape")
+    os.symlink(outside / "secret.csv", directory / "secret.csv")
+    return QueryExporter(str(directory))
+
+
+@pytest.mark.parametrize("path", ["../x.csv", "/tmp/x.csv", "escape/x.csv", ".", "escape"])
+def test_export_path_must_stay_inside_the_directory(exporter, path):
+    with pytest.raises(ValueError, match="inside"):
+        exporter.resolve(path, "csv")
+    # export rejects it before touching the connection or the file system.
+    with pytest.raises(ValueError, match="inside"):
+        asyncio.run(exporter.export(None, "SELECT 1", path=path))
+
+
+def test_relative_export_path_is_taken_inside_the_directory(exporter):
+    assert exporter.resolve("daily/report.csv", "csv") == os.path.join(exporter.directory, "daily", "report.csv")
+
+
+@pytest.mark.parametrize("name", ["../outside/secret.csv", "/etc/passwd.csv", "secret.csv", "escape/secret.csv",
+                                  "report.txt", "missing.csv"])
+def test_download_rejects_names_outside_the_directory(exporter, name):
+    assert exporter.download_path(name) is None
+
+
+def test_download_route_serves_only_files_inside_the_directory(tmp_path, exporter):
+    from starlette.testclient import TestClient
+    from services.database_config import Config
+    from services.postgres_mcp_server import PostgresMcpServer
+    from tests.conftest import write_config
+
+    server = PostgresMcpServer(Config(write_config(tmp_path, {})))
+    server.exporter = exporter
+    client = TestClient(server.http_app())
+
+    response = client.get("/exports/report.csv")
+    assert response.status_code == 200 and response.text == "n\n1\n"
+    for name in ("secret.csv", "..%2Foutside%2Fsecret.csv", "%2Fetc%2Fpasswd.csv", "escape%2Fsecret.csv"):
+        response = client.get(f"/exports/{name}")
+        assert response.status_code == 404 and "secret" not in response.text
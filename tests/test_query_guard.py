@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from services.database_config import Config
+from services.query_guard import QueryGuard
+
+
+def test_apply_limit_reports_the_added_limit():
+    guard = QueryGuard(default_limit=100)
+    assert guard.rewrite("SELECT * FROM album;") == ("SELECT * FROM album\nLIMIT 101", 100)
+    assert guard.rewrite("SELECT * FROM album LIMIT 5") == ("SELECT * FROM album LIMIT 5", None)
+    assert guard.rewrite("SELECT * FROM album FETCH FIRST 5 ROWS ONLY")[1] is None
+    assert QueryGuard(enabled=False, default_limit=100).rewrite("SELECT 1") == ("SELECT 1", None)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM album WHERE album_id IN (SELECT album_id FROM track ORDER BY album_id LIMIT 5)",
+    "SELECT * FROM album WHERE title = 'limit 5'",
+    "SELECT * FROM album -- limit 5",
+    "SELECT * FROM album /* fetch first 5 rows */",
+    'SELECT "limit 5" FROM album',
+    "SELECT * FROM album WHERE title <> ')' AND album_id IN (SELECT album_id FROM track LIMIT 5)",
+])
+def test_limit_outside_the_top_level_statement_does_not_count(sql):
+    assert QueryGuard(default_limit=100).rewrite(sql)[1] == 100
+
+
+def test_top_level_limit_after_a_subquery_counts():
+    sql = "SELECT * FROM album WHERE album_id IN (SELECT album_id FROM track WHERE title <> '(') LIMIT 10"
+    assert QueryGuard(default_limit=100).rewrite(sql) == (sql, None)
+
+
+def test_query_service_flags_truncated_results(config_file):
+    from services.postgres_mcp_server import PostgresMcpServer
+
+    async def run():
+        server = PostgresMcpServer(Config(config_file({"guard": {"default_limit": 50}})))
+        await server.db.connect()
+        try:
+            limited = await server.query_service.execute("SELECT album_id FROM album", use_cache=False)
+            explicit = await server.query_service.execute("SELECT album_id FROM album LIMIT 60", use_cache=False)
+            small = await server.query_service.execute("SELECT album_id FROM album WHERE album_id < 10",
+                                                       use_cache=False)
+            exact = await server.query_service.execute("SELECT album_id FROM album WHERE album_id <= 50",
+                                                       use_cache=False)
+            return limited, explicit, small, exact
+        finally:
+            await server.db.dispose()
+
+    limited, explicit, small, exact = asyncio.run(run())
+    assert len(limited["rows"]) == 50 and limited["limit_applied"] and limited["truncated"]
+    assert len(explicit["rows"]) == 60 and not explicit["limit_applied"] and not explicit["truncated"]
+    assert len(small["rows"]) == 9 and small["limit_applied"] and not small["truncated"]
+    assert len(exact["rows"]) == 50 and exact["limit_applied"] and not exact["truncated"]
@@ -0,0 +1,126 @@
+import asyncio
+import asyncpg
+import pytest
+
+from services.database_config import Config
+from services.result_cache import ResultCache
+
+CATALOG = {
+    "album": {"kind": "r"},
+    "track": {"kind": "r"},
+    "sales": {"kind": "p"},
+    "album_titles": {"kind": "v"},
+}
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT title FROM album WHERE album_id = 1", {"album"}),
+    ("SELECT t.title FROM album a JOIN track t ON t.album_id = a.album_id", {"album", "track"}),
+    ("SELECT * FROM album a JOIN track t ON t.album_id = a.album_id, music.album b", {"album", "track"}),
+    ("WITH recent AS (SELECT * FROM album WHERE release_year > 2000) SELECT count(*) FROM recent", {"album"}),
+    ("SELECT extract(year FROM a.released), lower(a.title) FROM album a", {"album"}),
+    ("SELECT * FROM album WHERE album_id IN (SELECT album_id FROM track)", {"album", "track"}),
+    ("SELECT round(avg(duration)::numeric(10, 2)) FROM track -- now()", {"track"}),
+    ("SELECT 'random()' FROM album", {"album"}),
+])
+def test_tables_of_cacheable_statements(sql, tables):
+    assert ResultCache.referenced_tables(sql, CATALOG, "music") == tables
+
+
+def test_partitioned_parent_is_not_cached():
+    assert ResultCache.referenced_tables("SELECT sum(amount) FROM sales", CATALOG, "music") is None
+    assert ResultCache.referenced_tables("SELECT * FROM album a JOIN sales s ON s.album_id = a.album_id",
+                                         CATALOG, "music") is None
+
+
+def test_view_is_not_cached():
+    assert ResultCache.referenced_tables("SELECT * FROM album_titles", CATALOG, "music") is None
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM album, shadow_table",
+    "SELECT * FROM album a JOIN pg_stat_activity s ON true",
+    "SELECT * FROM other.album",
+    "SELECT * FROM album WHERE album_id IN (SELECT album_id FROM archive)",
+    "SELECT 1",
+])
+def test_unknown_relation_is_not_cached(sql):
+    assert ResultCache.referenced_tables(sql, CATALOG, "music") is None
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT now(), title FROM album",
+    "SELECT * FROM album ORDER BY random()",
+    "SELECT nextval('album_seq') FROM album",
+    "SELECT * FROM track WHERE played_at > current_timestamp - interval '1 day'",
+    "SELECT my_schema.score(a.album_id) FROM album a",
+    'SELECT "Score"(album_id) FROM album',
+    "SELECT * FROM track WHERE played_at > 'now'::timestamptz - interval '1 day'",
+    "SELECT * FROM album WHERE released = date 'Today'",
+    "SELECT * FROM album WHERE released < CAST('tomorrow' AS date)",
+])
+def test_volatile_call_is_not_cached(sql):
+    assert ResultCache.referenced_tables(sql, CATALOG, "music") is None
+
+
+def test_result_is_not_stored_under_versions_taken_after_a_write():
+    counters = {"album": "1:100"}
+
+    async def load_counters():
+        return dict(counters)
+
+    async def run():
+        cache = ResultCache(load_counters, poll_interval=0.01)
+        assert cache.get("key") is None
+        await asyncio.sleep(0.05)
+        versions = cache.versions({"album"})
+        # A write commits while the query runs and the poll sees it before put.
+        counters["album"] = "2:100"
+        await asyncio.sleep(0.05)
+        cache.put("key", {"columns": [], "rows": []}, versions)
+        stale = cache.get("key")
+        cache.put("key", {"columns": [], "rows": []}, cache.versions({"album"}))
+        fresh = cache.get("key")
+        await cache.stop()
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+    assert stale is None and fresh is not None
+
+
+def test_truncate_changes_the_table_version(config_file, dsn, schema):
+    from services.postgres_mcp_server import PostgresMcpServer
+    server = PostgresMcpServer(Config(config_file()))
+
+    async def run():
+        await server.db.connect()
+        conn = await asyncpg.connect(dsn)
+        try:
+            before = await server.schema_service.fetch_table_counters()
+            await conn.execute(f"TRUNCATE {schema}.album")
+            after = await server.schema_service.fetch_table_counters()
+        finally:
+            await conn.close()
+            await server.db.dispose()
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before["album"] != after["album"]
+
+
+def test_uncacheable_statements_skip_the_lookup(config_file):
+    from services.postgres_mcp_server import PostgresMcpServer
+    server = PostgresMcpServer(Config(config_file({"result_cache": {"enabled": "true"}})))
+
+    async def run():
+        await server.db.connect()
+        try:
+            await server.query_service.execute("SELECT now(), title FROM album WHERE album_id = 1")
+            await server.query_service.execute("SELECT title FROM album WHERE album_id = 1")
+            return server.result_cache.stats()
+        finally:
+            await server.result_cache.stop()
+            await server.db.dispose()
+
+    stats = asyncio.run(run())
+    assert stats["misses"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+import datetime
+import decimal
+import pytest
+from services import result_encoding
+from services.database_config import Config
+from services.result_encoding import enabled_formats, to_json
+from src.metrics import OPERATION_SECONDS
+from tests.conftest import write_config
+
+
+def test_rows_is_always_enabled():
+    assert enabled_formats("columnar") == {"rows", "columnar"}
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="parquet"):
+        enabled_formats("rows, parquet")
+
+
+def test_arrow_without_pyarrow_is_rejected_at_config_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_encoding, "pa", None)
+    with pytest.raises(ValueError, match="pyarrow"):
+        Config(write_config(tmp_path, {"query": {"result_formats": "rows, arrow"}}))
+
+
+def test_query_service_refuses_formats_not_enabled(config_file):
+    from services.postgres_mcp_server import PostgresMcpServer
+
+    async def run():
+        server = PostgresMcpServer(Config(config_file({"query": {"result_formats": "rows"}})))
+        await server.db.connect()
+        try:
+            return (await server.query_service.execute("SELECT title FROM album WHERE album_id = 1", format="columnar"),
+                    await server.query_service.next_page("unused", format="arrow"))
+        finally:
+            await server.db.dispose()
+
+    executed, paged = asyncio.run(run())
+    assert executed.startswith("Error: ValueError: The columnar format is not enabled")
+    assert paged.startswith("Error: ValueError: The arrow format is not enabled")
+
+
+def test_tool_results_are_serialized_and_timed():
+    from fastmcp.tools.tool import default_serializer
+
+    page = {"columns": ["price", "day"], "rows": [[decimal.Decimal("9.90"), datetime.date(2024, 5, 1)]],
+            "next_token": None}
+    before = OPERATION_SECONDS._series.get(("serialization",), [None, 0.0, 0])[2]
+    # The same text FastMCP would have produced from the dict.
+    assert to_json(page) == default_serializer(page)
+    assert to_json("Error: ValueError: bad") == "Error: ValueError: bad"
+    assert OPERATION_SECONDS._series[("serialization",)][2] == before + 2
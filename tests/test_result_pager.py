@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from services.database_config import Config
+from services.result_pager import ResultPager
+from tests.conftest import write_config
+
+
+class FakeSource:
+    columns = ["n"]
+    limit_applied = None
+
+    def __init__(self, rows: int):
+        self.remaining = list(range(rows))
+        self.closed = False
+
+    async def fetch(self, n: int):
+        rows, self.remaining = self.remaining[:n], self.remaining[n:]
+        return [(row,) for row in rows]
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_abandoned_cursor_is_closed_without_further_queries():
+    async def run():
+        pager = ResultPager(page_size=2, idle_timeout=0.1, max_open=4)
+        pager.sweep_interval = 0.05
+        source = FakeSource(10)
+        page = await pager.open(source)
+        assert page["next_token"] is not None and not source.closed
+        await asyncio.sleep(0.3)
+        closed = source.closed
+        await pager.close_all()
+        return closed
+
+    assert asyncio.run(run())
+
+
+def test_exhausted_cursor_is_closed_with_its_last_page():
+    async def run():
+        pager = ResultPager(page_size=4, idle_timeout=60, max_open=4)
+        source = FakeSource(3)
+        page = await pager.open(source)
+        await pager.close_all()
+        return page, source.closed
+
+    page, closed = asyncio.run(run())
+    assert page["rows"] == [[0], [1], [2]] and page["next_token"] is None
+    assert closed
+
+
+def test_max_open_cursors_must_stay_below_pool_size(tmp_path):
+    with pytest.raises(ValueError, match="max_open_cursors"):
+        Config(write_config(tmp_path, {"pool": {"max_size": 4}, "query": {"max_open_cursors": 4}}))
+
+
+def read_all(pager: ResultPager, source: FakeSource) -> list[dict]:
+    async def run():
+        pages = [await pager.open(source)]
+        while pages[-1]["next_token"]:
+            pages.append(await pager.next_page(pages[-1]["next_token"]))
+        await pager.close_all()
+        return pages
+
+    return asyncio.run(run())
+
+
+def test_row_past_an_added_limit_marks_the_result_truncated():
+    # The guard's LIMIT n + 1 left one row more than the limit of 5.
+    source = FakeSource(6)
+    source.limit_applied = 5
+    pages = read_all(ResultPager(page_size=3, idle_timeout=60, max_open=4), source)
+    assert [len(page["rows"]) for page in pages] == [3, 2]
+    assert [page["truncated"] for page in pages] == [False, True]
+    assert all(page["limit_applied"] for page in pages) and source.closed
+
+
+def test_result_of_exactly_the_limit_is_not_truncated():
+    for page_size in (3, 5):
+        source = FakeSource(5)
+        source.limit_applied = 5
+        pages = read_all(ResultPager(page_size=page_size, idle_timeout=60, max_open=4), source)
+        assert sum(len(page["rows"]) for page in pages) == 5
+        assert not any(page["truncated"] for page in pages)
+        assert pages[-1]["next_token"] is None
+
+
+def test_limit_equal_to_the_page_size_needs_no_empty_page():
+    source = FakeSource(6)
+    source.limit_applied = 5
+    pages = read_all(ResultPager(page_size=5, idle_timeout=60, max_open=4), source)
+    assert len(pages) == 1 and len(pages[0]["rows"]) == 5 and pages[0]["truncated"]
+
+
+class SlowCloseSource(FakeSource):
+    def __init__(self, rows: int):
+        super().__init__(rows)
+        self.closing = asyncio.Event()
+
+    async def close(self) -> None:
+        self.closing.set()
+        await asyncio.sleep(1)
+        await super().close()
+
+
+def test_source_is_closed_when_open_is_cancelled():
+    async def run():
+        pager = ResultPager(page_size=2, idle_timeout=0, max_open=4)
+        idle = SlowCloseSource(10)
+        await pager.open(idle)
+        # The next open first closes the idle cursor; cancel it while that is in progress.
+        source = FakeSource(10)
+        task = asyncio.create_task(pager.open(source))
+        await idle.closing.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await pager.close_all()
+        return source.closed
+
+    assert asyncio.run(run())
@@ -0,0 +1,143 @@
+import asyncio
+import copy
+import asyncpg
+import math
+from services.database_config import Config
+from services.postgres_mcp_server import PostgresMcpServer
+from services.schema_index import CHARS_PER_TOKEN, SchemaIndex
+
+CATALOG = {
+    "album": {
+        "kind": "r",
+        "row_estimate": 1234,
+        "columns": [
+            {"name": "album_id", "type": "integer", "nullable": False},
+            {"name": "title", "type": "character varying(50)", "nullable": False},
+            {"name": "label_id", "type": "integer", "nullable": True},
+        ],
+        "primary_key": ["album_id"],
+        "foreign_keys": [{"columns": ["label_id"], "references": "record_label", "ref_columns": ["label_id"]}],
+        "indexes": [{"name": "album_pkey", "unique": True, "columns": ["album_id"]}],
+    },
+    "record_label": {
+        "kind": "r",
+        "row_estimate": 20,
+        "columns": [{"name": "label_id", "type": "integer", "nullable": False}],
+        "primary_key": ["label_id"],
+        "foreign_keys": None,
+        "indexes": None,
+    },
+}
+
+
+def test_fingerprint_ignores_row_estimates():
+    grown = copy.deepcopy(CATALOG)
+    grown["album"]["row_estimate"] = 98765
+    assert SchemaIndex(grown).fingerprint() == SchemaIndex(CATALOG).fingerprint()
+
+
+def test_fingerprint_changes_with_structure():
+    widened = copy.deepcopy(CATALOG)
+    widened["album"]["columns"][1]["type"] = "character varying(200)"
+    assert SchemaIndex(widened).fingerprint() != SchemaIndex(CATALOG).fingerprint()
+
+
+def test_render_rounds_row_estimates():
+    assert SchemaIndex(CATALOG).render_table("album").startswith("album (~1000 rows):")
+
+
+def cost(index, table):
+    return math.ceil((len(index.render_table(table)) + 1) / CHARS_PER_TOKEN)
+
+
+def test_rank_prefers_table_names_over_column_names():
+    index = SchemaIndex(CATALOG)
+    assert [table for table, _ in index.rank("Which label has the most releases?")] == ["record_label", "album"]
+    assert [table for table, _ in index.rank("List album titles")] == ["album"]
+    assert index.rank("What is the weather today?") == []
+
+
+def test_rank_matches_plurals():
+    index = SchemaIndex(CATALOG)
+    assert index.rank("albums by labels") == index.rank("album by label")
+
+
+def test_select_adds_foreign_key_neighbours():
+    index = SchemaIndex(CATALOG)
+    # record_label only matches through album's foreign key, in either direction.
+    assert index.select("album titles", top_k=1, token_budget=1000) == index.render(["album", "record_label"])
+    assert index.select("labels", top_k=1, token_budget=1000) == index.render(["record_label", "album"])
+
+
+def test_select_falls_back_to_every_table():
+    index = SchemaIndex(CATALOG)
+    assert index.select("What is the weather today?", top_k=1, token_budget=1000) == index.render()
+
+
+def test_select_trims_to_the_token_budget():
+    catalog = copy.deepcopy(CATALOG)
+    catalog["distributor"] = {
+        "kind": "r",
+        "row_estimate": 5,
+        "columns": [{"name": "label_id", "type": "integer", "nullable": False}],
+        "primary_key": None,
+        "foreign_keys": [{"columns": ["label_id"], "references": "record_label", "ref_columns": ["label_id"]}],
+        "indexes": None,
+    }
+    index = SchemaIndex(catalog)
+    budget = cost(index, "record_label") + cost(index, "distributor")
+    assert cost(index, "album") > cost(index, "distributor")
+
+    # album does not fit after record_label; the smaller distributor still does.
+    assert index.select("record label", top_k=1, token_budget=budget) == index.render(["record_label", "distributor"])
+    assert index.select("record label", top_k=1, token_budget=budget - 1) == index.render(["record_label"])
+
+
+def test_select_keeps_the_best_table_over_budget():
+    index = SchemaIndex(CATALOG)
+    assert index.select("album titles", top_k=1, token_budget=1) == index.render(["album"])
+
+
+def test_fingerprint_survives_writes_and_analyze(config_file, dsn, schema):
+    server = PostgresMcpServer(Config(config_file()))
+
+    async def run():
+        await server.db.connect()
+        try:
+            before = await server.schema_service.cache.refresh()
+            conn = await asyncpg.connect(dsn)
+            await conn.execute(f"INSERT INTO {schema}.album SELECT i, 'More ' || i FROM generate_series(1000, 5000) AS i")
+            await conn.execute(f"ANALYZE {schema}.album")
+            await conn.close()
+            after = await server.schema_service.cache.refresh()
+        finally:
+            await server.schema_service.cache.stop()
+            await server.db.dispose()
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before.index.row_estimates["album"] != after.index.row_estimates["album"]
+    assert before.fingerprint == after.fingerprint
+
+
+def test_catalog_version_tracks_column_changes(config_file, dsn, schema):
+    server = PostgresMcpServer(Config(config_file()))
+
+    async def run():
+        await server.db.connect()
+        conn = await asyncpg.connect(dsn)
+        try:
+            versions = [await server.schema_service.fetch_catalog_version()]
+            for ddl in ("ALTER TABLE {}.album ALTER COLUMN title TYPE varchar(200)",
+                        "ALTER TABLE {}.album ALTER COLUMN release_year SET NOT NULL",
+                        "ALTER TABLE {}.album ADD COLUMN note text",
+                        "ALTER TABLE {}.album DROP COLUMN note"):
+                await conn.execute(ddl.format(schema))
+                versions.append(await server.schema_service.fetch_catalog_version())
+        finally:
+            await conn.close()
+            await server.db.dispose()
+        return versions
+
+    versions = asyncio.run(run())
+    assert len(set(versions)) == len(versions)
@@ -0,0 +1,115 @@
+import asyncio
+import asyncpg
+from services.database_config import Config
+from services.database_handler import Database
+from services.statement_cache import StatementCache, parameterize
+
+
+async def fetch_through_pool(db: Database, statements: StatementCache, sql: str):
+    async with db.get_conn() as conn:
+        query, args, columns = await statements.prepare(conn, sql)
+        return columns, await conn.fetch(query, *args)
+
+
+def test_parameterize_replaces_compared_literals():
+    assert parameterize("SELECT * FROM album WHERE title = 'It''s' LIMIT 5") == (
+        "SELECT * FROM album WHERE title = $1 LIMIT $2", ["It's", 5]
+    )
+    assert parameterize("SELECT * FROM album WHERE album_id = $1") == (None, [])
+
+
+def test_same_shape_reused_across_pool_checkouts(config_file):
+    async def run():
+        db = Database(Config(config_file({"pool": {"min_size": 1, "max_size": 1}, "query": {"max_open_cursors": 0}})))
+        statements = StatementCache()
+        await db.connect()
+        try:
+            results = [
+                await fetch_through_pool(db, statements, f"SELECT title FROM album WHERE album_id = {i}")
+                for i in range(1, 5)
+            ]
+        finally:
+            await db.dispose()
+        return results, statements.stats()
+
+    results, stats = asyncio.run(run())
+    assert [rows[0]["title"] for _, rows in results] == ["Album 1", "Album 2", "Album 3", "Album 4"]
+    assert all(columns == ["title"] for columns, _ in results)
+    assert (stats["shape_misses"], stats["shape_hits"], stats["fallbacks"]) == (1, 3, 0)
+    # One connection: the statement is prepared on it once.
+    assert (stats["misses"], stats["hits"]) == (1, 3)
+
+
+def test_stale_shape_is_evicted_after_ddl(config_file, dsn, schema):
+    async def run():
+        db = Database(Config(config_file({"pool": {"min_size": 1, "max_size": 1}, "query": {"max_open_cursors": 0}})))
+        statements = StatementCache()
+        await db.connect()
+        try:
+            await fetch_through_pool(db, statements, "SELECT * FROM album WHERE album_id = 1")
+            conn = await asyncpg.connect(dsn)
+            await conn.execute(f"ALTER TABLE {schema}.album ALTER COLUMN release_year TYPE text")
+            await conn.close()
+
+            async with db.get_conn() as conn:
+                query, args, _ = await statements.prepare(conn, "SELECT * FROM album WHERE album_id = 2")
+                async with conn.transaction():
+                    try:
+                        await conn.fetch(query, *args)
+                    except asyncpg.InvalidCachedStatementError as e:
+                        assert statements.invalidate(query, e)
+                    else:
+                        raise AssertionError("expected the cached statement to be stale")
+            columns, rows = await fetch_through_pool(db, statements, "SELECT * FROM album WHERE album_id = 2")
+        finally:
+            await db.dispose()
+        return rows, statements.stats()
+
+    rows, stats = asyncio.run(run())
+    assert rows[0]["release_year"] == "1962"
+    assert stats["evictions"] == 1
+
+
+def test_query_service_runs_repeated_shapes(config_file):
+    from services.postgres_mcp_server import PostgresMcpServer
+
+    async def run():
+        server = PostgresMcpServer(Config(config_file()))
+        await server.db.connect()
+        try:
+            return [
+                await server.query_service.execute(f"SELECT title FROM album WHERE album_id = {i}")
+                for i in range(1, 4)
+            ], server.statements.stats()
+        finally:
+            await server.db.dispose()
+
+    pages, stats = asyncio.run(run())
+    assert [page["rows"] for page in pages] == [[["Album 1"]], [["Album 2"]], [["Album 3"]]]
+    assert stats["shape_hits"] == 2
+
+
+def test_guard_explain_does_not_add_statements_per_literal(config_file):
+    from services.postgres_mcp_server import PostgresMcpServer
+
+    async def run():
+        server = PostgresMcpServer(Config(config_file({"pool": {"min_size": 1, "max_size": 2},
+                                                       "query": {"max_open_cursors": 1}})))
+        await server.db.connect()
+
+        async def prepared_after(ids) -> int:
+            for i in ids:
+                await server.query_service.execute(f"SELECT title FROM album WHERE album_id = {i}", use_cache=False)
+            async with server.db.get_conn() as conn:
+                return await conn.fetchval("SELECT count(*) FROM pg_prepared_statements")
+
+        try:
+            # min_size 1 and sequential calls: every statement runs on the same connection.
+            return await prepared_after(range(1, 4)), await prepared_after(range(4, 10)), server.statements.stats()
+        finally:
+            await server.db.dispose()
+
+    first, later, stats = asyncio.run(run())
+    assert later == first
+    # The query and its EXPLAIN are prepared once, then reused by the other 8 runs.
+    assert (stats["misses"], stats["hits"]) == (2, 16)